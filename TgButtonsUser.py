@@ -81,7 +81,6 @@ class TgButtonsUser:
 
     @staticmethod
     def get_meeting(member: Member, meeting: Meeting) -> InlineKeyboardBuilder:
-        free_tickets: list[Ticket] = meeting.get_free_tickets()
         btn_builder = InlineKeyboardBuilder()
         member_ticket: Ticket | None = meeting.get_ticket_by_tg_id(tg_id=member.get_tg_id())
         if member_ticket:
@@ -102,7 +101,7 @@ class TgButtonsUser:
                     builder=btn_builder,
                     pk=meeting.get_pk()
                 )
-        elif free_tickets:
+        elif meeting.get_cnt_free_tickets():
             btn_builder = TgButtonsUser.add_booking(
                 builder=btn_builder,
                 pk=meeting.get_pk()
@@ -1,8 +1,25 @@
+import asyncio
 import json
+import random
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable
 
 import aiohttp
+from multidict import CIMultiDictProxy
 
-from api.settings import datetime_format_str, datetime_format_str_api
+from api.base.ApiErrors import ApiCircuitOpenError, ApiResponseError, ApiUnavailableError
+from api.base.CircuitBreaker import CircuitBreaker
+from api.base.SingleFlight import SingleFlight
+from utils.Deadline import DeadlineExceeded, clear_deadline, get_remaining, within_deadline
+from api.settings import (
+    datetime_format_str, datetime_format_str_api,
+    api_pool_limit, api_pool_limit_per_host, api_keepalive_timeout, api_dns_cache_ttl, api_request_timeout,
+    api_validators_cache_size, api_batch_size, api_page_size,
+    api_get_retries, api_backoff_base, api_backoff_cap, api_retry_after_max,
+    api_breaker_failures, api_breaker_reset_timeout,
+)
 
 
 T_HOST = str
@@ -10,41 +27,177 @@ HEADERS: dict = {
     "Content-Type": "application/json"
 }
 
+_session: aiohttp.ClientSession | None = None
+_get_flight: SingleFlight = SingleFlight()
+_breakers: dict[str, CircuitBreaker] = {}
+# url -> (etag, last modified, decoded payload) of the last 200 answer
+_validators: OrderedDict[tuple, tuple[str | None, str | None, list[dict]]] = OrderedDict()
 
-async def api_get(url: str, data: dict | None = None) -> list[dict]:
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        async with session.get(url=url, params=data) as response:
-            if str(response.status).startswith("20"):
-                text = await response.text()
-                return json.loads(text)
-            else:
-                return []
+
+def get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            headers=HEADERS,
+            connector=aiohttp.TCPConnector(
+                limit=api_pool_limit,
+                limit_per_host=api_pool_limit_per_host,
+                keepalive_timeout=api_keepalive_timeout,
+                ttl_dns_cache=api_dns_cache_ttl,
+            ),
+        )
+    return _session
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    endpoint: str = url.split("?", 1)[0]
+    breaker: CircuitBreaker | None = _breakers.get(endpoint)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            failure_threshold=api_breaker_failures,
+            reset_timeout=api_breaker_reset_timeout,
+        )
+        _breakers[endpoint] = breaker
+    return breaker
+
+
+def get_backoff(attempt: int) -> float:
+    return random.uniform(0, min(api_backoff_cap, api_backoff_base * 2 ** attempt))
+
+
+def get_retry_after(headers: CIMultiDictProxy) -> float | None:
+    value: str | None = headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    # or an http date
+    try:
+        date_time: datetime = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date_time.tzinfo is None:
+        date_time = date_time.replace(tzinfo=timezone.utc)
+    return max(0.0, (date_time - datetime.now(timezone.utc)).total_seconds())
+
+
+async def api_request(method: str, url: str, retries: int = 0, **kwargs) -> tuple[int, str, CIMultiDictProxy]:
+    breaker: CircuitBreaker = get_breaker(url)
+    if not breaker.allow():
+        raise ApiCircuitOpenError(url)
+
+    session: aiohttp.ClientSession = get_session()
+    attempt: int = 0
+    while True:
+        retry_after: float | None = None
+        remaining: float | None = get_remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded()
+        timeout: float = api_request_timeout if remaining is None else min(api_request_timeout, remaining)
+
+        try:
+            async with session.request(
+                    method, url=url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+            ) as response:
+                status: int = response.status
+                text: str = await response.text()
+                headers: CIMultiDictProxy = response.headers
+        except asyncio.TimeoutError as e:
+            if timeout < api_request_timeout:
+                # our own budget ran out, the backend is not to blame
+                raise DeadlineExceeded() from e
+            error: ApiUnavailableError = ApiUnavailableError(url)
+            error.__cause__ = e
+        except aiohttp.ClientError as e:
+            error: ApiUnavailableError = ApiUnavailableError(url)
+            error.__cause__ = e
+        else:
+            if status < 500 and status != 429:
+                breaker.record_success()
+                return status, text, headers
+            error: ApiUnavailableError = ApiUnavailableError(url, status)
+            if status == 429:
+                retry_after = get_retry_after(headers)
+
+        if attempt >= retries:
+            breaker.record_failure()
+            raise error
+
+        attempt += 1
+        # the backend knows better when it can take the request again
+        backoff: float = get_backoff(attempt) if retry_after is None else retry_after
+        remaining = get_remaining()
+        if backoff > api_retry_after_max or (remaining is not None and remaining <= backoff):
+            breaker.record_failure()
+            raise error
+        await asyncio.sleep(backoff)
+
+
+async def api_get(url: str, data: dict | None = None, use_validators: bool = True) -> list[dict]:
+    key: tuple = (url, tuple(sorted((str(k), str(v)) for k, v in (data or {}).items())))
+    # every caller waits within its own budget, the shared request is not bound to the first one's
+    return await within_deadline(_get_flight.do(
+        key,
+        lambda: _api_get(key=key, url=url, data=data, use_validators=use_validators),
+    ))
+
+
+async def _api_get(key: tuple, url: str, data: dict | None = None, use_validators: bool = True) -> list[dict]:
+    clear_deadline()
+    cached: tuple[str | None, str | None, list[dict]] | None = _validators.get(key) if use_validators else None
+    headers: dict = {}
+    if cached:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    status, text, response_headers = await api_request(
+        "GET", url=url, retries=api_get_retries, params=data, headers=headers,
+    )
+    if status == 304 and cached:
+        _validators.move_to_end(key)
+        return cached[2]
+    elif str(status).startswith("20"):
+        payload: list[dict] = json.loads(text)
+        etag: str | None = response_headers.get("ETag")
+        last_modified: str | None = response_headers.get("Last-Modified")
+        if use_validators and (etag or last_modified):
+            _validators[key] = (etag, last_modified, payload)
+            _validators.move_to_end(key)
+            while len(_validators) > api_validators_cache_size:
+                _validators.popitem(last=False)
+        else:
+            _validators.pop(key, None)
+        return payload
+    else:
+        raise ApiResponseError(url, status)
 
 
 async def api_post(url: str, data: dict) -> dict:
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        async with session.post(url=url, data=json.dumps(data)) as response:
-            if str(response.status).startswith("20"):
-                text = await response.text()
-                return json.loads(text)
-            else:
-                return {}
-            
-            
+    status, text, _ = await api_request("POST", url=url, data=json.dumps(data))
+    if str(status).startswith("20"):
+        return json.loads(text)
+    else:
+        raise ApiResponseError(url, status)
+
+
 async def api_delete(url: str, data: dict) -> bool:
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        async with session.delete(url=url, data=json.dumps(data)) as response:
-            return response.status == 204
+    status, _, _ = await api_request("DELETE", url=url, data=json.dumps(data))
+    return status == 204
 
 
 async def api_patch(url: str, data: dict) -> dict:
-    async with aiohttp.ClientSession(headers=HEADERS) as session:
-        async with session.patch(url=url, data=json.dumps(data)) as response:
-            if str(response.status).startswith("20"):
-                text = await response.text()
-                return json.loads(text)
-            else:
-                return {}
+    status, text, _ = await api_request("PATCH", url=url, data=json.dumps(data))
+    if str(status).startswith("20"):
+        return json.loads(text)
+    else:
+        raise ApiResponseError(url, status)
 
 
 class ApiBase:
@@ -53,6 +206,21 @@ class ApiBase:
         self._date_time_format: str = datetime_format_str
         self._date_time_format_db: str = datetime_format_str_api
 
+    @staticmethod
+    async def start_session() -> None:
+        get_session()
+
+    @staticmethod
+    async def close_session() -> None:
+        global _session
+        if _session is not None and not _session.closed:
+            await _session.close()
+        _session = None
+
+    @staticmethod
+    def get_coalescing_stats() -> dict[str, int]:
+        return _get_flight.get_stats()
+
     async def _api_add_member(self, **kwargs) -> dict:
         return await api_post(url=f"{self.base}/api/members/", data=kwargs)
 
@@ -95,8 +263,50 @@ class ApiBase:
         params: str = self._get_str_from_kwargs(kwargs)
         return await api_get(url=f"{self.base}/api/bookings?{params}")
 
+    async def _api_get_chunked(
+            self, getter: Callable[..., Awaitable[list[dict]]], field: str, values: list, **kwargs
+    ) -> list[dict]:
+        chunks: list[list] = [values[i:i + api_batch_size] for i in range(0, len(values), api_batch_size)]
+        results: list[list[dict]] = await asyncio.gather(*[
+            getter(**{field: ",".join(map(str, chunk))}, **kwargs) for chunk in chunks
+        ])
+        return [item for result in results for item in result]
+
+    async def _api_iter_pages(self, path: str, page_size: int = api_page_size, **kwargs) -> AsyncIterator[list[dict]]:
+        async def get_page(offset: int) -> list[dict] | dict:
+            params: str = self._get_str_from_kwargs({**kwargs, "limit": page_size, "offset": offset})
+            # pages are read once, keeping them for revalidation would only grow memory
+            return await api_get(url=f"{self.base}/api/{path}?{params}", use_validators=False)
+
+        offset: int = 0
+        first_item: dict | None = None
+        next_page: asyncio.Future | None = asyncio.ensure_future(get_page(offset))
+        try:
+            while next_page is not None:
+                page: list[dict] | dict = await next_page
+                if isinstance(page, dict):
+                    items: list[dict] = page.get("results", [])
+                    has_more: bool = bool(page.get("next"))
+                else:
+                    items: list[dict] = page
+                    # a plain list longer than a page, or the same page again, means limit/offset were ignored
+                    if items and offset and items[0] == first_item:
+                        return
+                    has_more: bool = len(page) == page_size
+                    first_item = items[0] if items else None
+
+                offset += page_size
+                # the next page is fetched while the caller consumes this one
+                next_page = asyncio.ensure_future(get_page(offset)) if has_more and items else None
+                yield items
+        finally:
+            if next_page is not None and not next_page.done():
+                next_page.cancel()
+
     def _get_str_from_kwargs(self, kwargs: dict) -> str:
         params = []
         for key, val in kwargs.items():
+            if isinstance(val, (list, tuple)):
+                val = ",".join(map(str, val))
             params.append(f"{key}={val}")
         return "&".join(params)
@@ -0,0 +1,19 @@
+
+
+class ApiError(Exception):
+    def __init__(self, url: str, status: int | None = None):
+        super().__init__(f"{url} - {status}" if status else url)
+        self.url: str = url
+        self.status: int | None = status
+
+
+class ApiUnavailableError(ApiError):
+    pass
+
+
+class ApiCircuitOpenError(ApiUnavailableError):
+    pass
+
+
+class ApiResponseError(ApiError):
+    pass
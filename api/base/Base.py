@@ -4,13 +4,16 @@ from api.settings import datetime_format_str, datetime_format_str_api
 
 
 class Base:
+    __slots__ = ("_pk",)
+
+    _datetime_format_str: str = datetime_format_str
+    _date_time_format_db: str = datetime_format_str_api
+
     def __init__(
         self, pk: int | None = None,
     ):
 
         self._pk: int | None = pk
-        self._datetime_format_str: str = datetime_format_str
-        self._date_time_format_db: str = datetime_format_str_api
 
     def get_pk(self) -> int:
         return self._pk
@@ -0,0 +1,33 @@
+import time
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self._failure_threshold: int = failure_threshold
+        self._reset_timeout: float = reset_timeout
+        self._failures: int = 0
+        self._opened_at: float | None = None
+
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+
+        now: float = time.monotonic()
+        if now - self._opened_at < self._reset_timeout:
+            return False
+
+        # half-open: let one probe through per reset interval
+        self._opened_at = now
+        return True
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
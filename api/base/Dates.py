@@ -0,0 +1,21 @@
+from datetime import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from api.settings import club_timezone
+
+
+CLUB_TZ: ZoneInfo = ZoneInfo(club_timezone)
+
+
+@lru_cache(maxsize=4096)
+def parse_api_datetime(value: str) -> datetime:
+    # naive values from the backend are club local time
+    date_time: datetime = datetime.fromisoformat(value)
+    if date_time.tzinfo is None:
+        return date_time.replace(tzinfo=CLUB_TZ)
+    return date_time.astimezone(CLUB_TZ)
+
+
+def club_now() -> datetime:
+    return datetime.now(CLUB_TZ)
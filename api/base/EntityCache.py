@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+from utils.Deadline import clear_deadline
+
+
+T_LOADER = Callable[[], Awaitable[Any]]
+
+
+class EntityCache:
+    def __init__(
+            self, maxsize: int, ttl: float, stale_ttl: float = 0.0,
+            stale_if_error: tuple[type[Exception], ...] = (), stale_if_error_ttl: float = 0.0,
+    ):
+        self._maxsize: int = maxsize
+        self._ttl: float = ttl
+        self._stale_ttl: float = stale_ttl
+        self._stale_if_error: tuple[type[Exception], ...] = stale_if_error
+        # how old an entry may be to stand in for a failed load
+        self._stale_if_error_ttl: float = stale_if_error_ttl
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._refreshing: dict[Hashable, asyncio.Task] = {}
+        # bumped on every invalidation, a load started before its key was invalidated is not stored
+        self._epoch: int = 0
+        self._invalidated: OrderedDict[Hashable, int] = OrderedDict()
+        # loads started before it are not stored for any key: cleared, or the key was forgotten
+        self._floor: int = 0
+
+    def get_epoch(self) -> int:
+        return self._epoch
+
+    async def get_or_load(self, key: Hashable, loader: T_LOADER) -> Any:
+        entry: tuple[Any, float] | None = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age: float = time.monotonic() - stored_at
+            if age < self._ttl:
+                self._entries.move_to_end(key)
+                return value
+            if age < self._ttl + self._stale_ttl:
+                self._entries.move_to_end(key)
+                self._refresh(key, loader)
+                return value
+
+        return await self._load(key, loader)
+
+    def peek(self, key: Hashable) -> Any:
+        entry: tuple[Any, float] | None = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] >= self._ttl:
+            return None
+        return entry[0]
+
+    def get_last(self, key: Hashable) -> Any:
+        entry: tuple[Any, float] | None = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: Hashable, value: Any, epoch: int | None = None):
+        if epoch is not None and (epoch < self._floor or epoch < self._invalidated.get(key, 0)):
+            return
+
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._epoch += 1
+        self._entries.pop(key, None)
+        self._invalidated[key] = self._epoch
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > self._maxsize:
+            _, epoch = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, epoch)
+
+    def clear(self):
+        self._epoch += 1
+        self._floor = self._epoch
+        self._invalidated.clear()
+        self._entries.clear()
+
+    async def _load(self, key: Hashable, loader: T_LOADER) -> Any:
+        epoch: int = self._epoch
+        try:
+            value: Any = await loader()
+        except self._stale_if_error:
+            entry: tuple[Any, float] | None = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] >= self._stale_if_error_ttl:
+                raise
+            return entry[0]
+
+        if value is not None:
+            self.set(key, value, epoch=epoch)
+        return value
+
+    def _refresh(self, key: Hashable, loader: T_LOADER):
+        if key in self._refreshing:
+            return
+
+        task: asyncio.Task = asyncio.ensure_future(self._refresh_load(key, loader))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda t: self._refresh_done(key, t))
+
+    async def _refresh_load(self, key: Hashable, loader: T_LOADER) -> Any:
+        # runs on its own, not within the budget of the update that noticed the stale entry
+        clear_deadline()
+        return await self._load(key, loader)
+
+    def _refresh_done(self, key: Hashable, task: asyncio.Task):
+        self._refreshing.pop(key, None)
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._tasks: dict[Hashable, asyncio.Future] = {}
+        self._calls: int = 0
+        self._requests: int = 0
+        self._collapsed: int = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._calls += 1
+        task: asyncio.Future | None = self._tasks.get(key)
+        if task is None:
+            self._requests += 1
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self._collapsed += 1
+
+        # shield: a cancelled caller must not cancel the request shared with the others
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            "calls": self._calls,
+            "requests": self._requests,
+            "collapsed": self._collapsed,
+            "in_flight": len(self._tasks),
+        }
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()
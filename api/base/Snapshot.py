@@ -0,0 +1,50 @@
+import marshal
+
+from api.meetings.Meeting import Meeting
+from api.members.Member import Member
+from api.subscribes.Subscribe import Subscribe
+
+
+MAGIC: bytes = b"LS"
+# bump on any change of a to_tuple layout, readers treat other versions as a cache miss
+SCHEMA_VERSION: int = 1
+MARSHAL_VERSION: int = 4
+
+TYPES: dict[int, type] = {
+    1: Meeting,
+    2: Member,
+    3: Subscribe,
+}
+TYPE_CODES: dict[type, int] = {cls: code for code, cls in TYPES.items()}
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+class SnapshotVersionError(SnapshotError):
+    pass
+
+
+def dumps(obj: Meeting | Member | Subscribe) -> bytes:
+    code: int | None = TYPE_CODES.get(type(obj))
+    if code is None:
+        raise SnapshotError(f"can't snapshot {type(obj).__name__}")
+    return MAGIC + bytes((SCHEMA_VERSION, code)) + marshal.dumps(obj.to_tuple(), MARSHAL_VERSION)
+
+
+def loads(data: bytes) -> Meeting | Member | Subscribe:
+    if data[:2] != MAGIC:
+        raise SnapshotError("not a snapshot")
+    if len(data) < 4:
+        raise SnapshotError("truncated snapshot header")
+    if data[2] != SCHEMA_VERSION:
+        raise SnapshotVersionError(f"snapshot schema {data[2]}, expected {SCHEMA_VERSION}")
+
+    cls: type | None = TYPES.get(data[3])
+    if cls is None:
+        raise SnapshotError(f"unknown snapshot type {data[3]}")
+    try:
+        return cls.from_tuple(marshal.loads(data[4:]))
+    except (EOFError, ValueError, TypeError) as e:
+        raise SnapshotError("broken snapshot") from e
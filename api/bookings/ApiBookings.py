@@ -1,4 +1,7 @@
+from typing import AsyncIterator
+
 from api.base.ApiBase import ApiBase, T_HOST
+from api.meetings.MeetingsCache import meetings_cache
 from .Booking import Booking
 from ..settings import datetime_format_str_api
 
@@ -11,33 +14,49 @@ class ApiBookings(ApiBase):
         bookings = await self._api_get_bookings()
         return [Booking(**booking) for booking in bookings]
 
+    async def iter_bookings(self) -> AsyncIterator[Booking]:
+        async for page in self._api_iter_pages("bookings"):
+            for booking in page:
+                yield Booking(**booking)
+
     async def get_booking_by_pk(self, pk: int) -> Booking | None:
         booking = await self._api_get_bookings(id=pk)
         return Booking(**booking[0]) if booking else None
 
     async def add_booking(self, new_booking: Booking, member_id, ticket_id,) -> Booking:
-        result: dict = await self._api_add_booking(
-            date_time=new_booking.get_date_time().strftime(datetime_format_str_api),
-            is_paid=new_booking.is_paid(),
-            user_confirm_paid=new_booking.is_user_confirm_paid(),
-            member_id=member_id,
-            ticket_id=ticket_id,
-        )
+        try:
+            result: dict = await self._api_add_booking(
+                date_time=new_booking.get_date_time().strftime(datetime_format_str_api),
+                is_paid=new_booking.is_paid(),
+                user_confirm_paid=new_booking.is_user_confirm_paid(),
+                member_id=member_id,
+                ticket_id=ticket_id,
+            )
+        finally:
+            meetings_cache.invalidate_ticket(ticket_id)
+
         if result:
             return Booking(**result)
         else:
             raise
 
     async def delete_booking(self, booking: Booking) -> bool:
-        return await self._api_delete_booking(pk=booking.get_pk())
+        try:
+            return await self._api_delete_booking(pk=booking.get_pk())
+        finally:
+            meetings_cache.invalidate_booking(booking.get_pk())
 
     async def update_booking(self, booking: Booking) -> Booking:
-        result: dict = await self._api_patch_booking(
-            pk=booking.get_pk(),
-            date_time=booking.get_date_time().strftime(datetime_format_str_api),
-            is_paid=booking.is_paid(),
-            user_confirm_paid=booking.is_user_confirm_paid(),
-        )
+        try:
+            result: dict = await self._api_patch_booking(
+                pk=booking.get_pk(),
+                date_time=booking.get_date_time().strftime(datetime_format_str_api),
+                is_paid=booking.is_paid(),
+                user_confirm_paid=booking.is_user_confirm_paid(),
+            )
+        finally:
+            meetings_cache.invalidate_booking(booking.get_pk())
+
         if result:
             return Booking(**result)
         else:
@@ -1,10 +1,13 @@
 from datetime import datetime
 
 from api.base.Base import Base
+from api.base.Dates import parse_api_datetime
 from api.members.Member import Member
 
 
 class Booking(Base):
+    __slots__ = ("_date_time", "_date_time_raw", "_member", "_member_raw", "_is_paid", "_user_confirm_paid")
+
     def __init__(
             self, date_time: str, is_paid: bool, user_confirm_paid: bool, pk: int | None = None, **kwargs
     ):
@@ -12,21 +15,26 @@ class Booking(Base):
 
         self._date_time: datetime | None = None
         self._member: Member | None = None
+        # parsed on first access
+        self._date_time_raw: str = date_time
+        self._member_raw: dict | None = None
 
         self._is_paid: bool = is_paid
         self._user_confirm_paid: bool = user_confirm_paid
-        self._pk: int | None = pk
-
-        self._set_date_time(datetime.strptime(date_time, self._date_time_format_db))
 
         member: dict = kwargs.get("member") if "member" in kwargs else {}
         if member:
-            self._set_member(member)
+            self._member_raw = member
 
     def get_date_time(self) -> datetime:
+        if self._date_time is None:
+            self._set_date_time(parse_api_datetime(self._date_time_raw))
         return self._date_time
 
     def get_member(self) -> Member:
+        if self._member_raw is not None:
+            self._set_member(self._member_raw)
+            self._member_raw = None
         return self._member
 
     def get_pk(self) -> int:
@@ -49,3 +57,19 @@ class Booking(Base):
 
     def _set_member(self, value: dict):
         self._member: Member = Member(**value)
+
+    def to_tuple(self) -> tuple:
+        member: Member | None = self.get_member()
+        return (
+            self._pk, self._date_time_raw, self._is_paid, self._user_confirm_paid,
+            member.to_tuple() if member else None,
+        )
+
+    @classmethod
+    def from_tuple(cls, data: tuple) -> "Booking":
+        booking: Booking = cls.__new__(cls)
+        booking._pk, booking._date_time_raw, booking._is_paid, booking._user_confirm_paid, member = data
+        booking._date_time = None
+        booking._member = Member.from_tuple(member) if member else None
+        booking._member_raw = None
+        return booking
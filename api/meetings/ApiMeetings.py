@@ -2,8 +2,10 @@ from datetime import datetime, timedelta
 
 
 from api.base.ApiBase import ApiBase, T_HOST
+from api.base.Dates import CLUB_TZ, club_now
 from api.meetings.Meeting import Meeting
-from api.settings import datetime_format_str_api
+from api.meetings.MeetingsCache import meetings_cache
+from api.settings import datetime_format_str_api, future_meetings_window
 
 
 class ApiMeetings(ApiBase):
@@ -15,10 +17,49 @@ class ApiMeetings(ApiBase):
         return [Meeting(**meeting) for meeting in meetings]
 
     async def get_meeting_by_pk(self, pk: int) -> Meeting | None:
+        return await meetings_cache.get_meeting(pk, lambda: self._get_meeting_by_pk(pk))
+
+    async def get_meetings_by_pks(self, pks: list[int]) -> list[Meeting | None]:
+        found: dict[int, Meeting] = await meetings_cache.get_meetings(
+            list(dict.fromkeys(pks)),
+            self._get_meetings_by_pks,
+        )
+        return [found.get(pk) for pk in pks]
+
+    async def get_future_meetings(self, fields: tuple[str, ...] | None = None) -> list[Meeting]:
+        date_time_str: str = self._get_future_cutoff().strftime(datetime_format_str_api)
+        return await meetings_cache.get_future(
+            (date_time_str, fields),
+            lambda: self._get_future_meetings(date_time_str, fields),
+            is_full=fields is None,
+        )
+
+    async def get_meeting_by_pk_fresh(self, pk: int) -> Meeting | None:
+        # straight from the backend, for state that must not lag behind bookings; the cache gets it too
+        return await meetings_cache.get_meeting_fresh(pk, lambda: self._get_meeting_by_pk(pk))
+
+    async def get_future_meetings_fresh(self) -> list[Meeting]:
+        date_time_str: str = self._get_future_cutoff().strftime(datetime_format_str_api)
+        return await self._get_future_meetings(date_time_str, None)
+
+    async def _get_meeting_by_pk(self, pk: int) -> Meeting | None:
         meeting: list[dict] = await self._api_get_meetings(id=pk)
         return Meeting(**meeting[0]) if meeting else None
 
-    async def get_future_meetings(self) -> list[Meeting]:
-        date_time_str: str = (datetime.now() + timedelta(hours=1)).strftime(datetime_format_str_api)
-        meetings: list[dict] = await self._api_get_meetings(date_time_gte=date_time_str)
+    async def _get_meetings_by_pks(self, pks: list[int]) -> list[Meeting]:
+        meetings: list[dict] = await self._api_get_chunked(self._api_get_meetings, "id__in", pks)
+        return [Meeting(**meeting) for meeting in meetings]
+
+    async def _get_future_meetings(self, date_time_str: str, fields: tuple[str, ...] | None) -> list[Meeting]:
+        params: dict = {"date_time_gte": date_time_str}
+        if fields:
+            params["fields"] = fields
+        meetings: list[dict] = await self._api_get_meetings(**params)
         return [Meeting(**meeting) for meeting in meetings]
+
+    @staticmethod
+    def _get_future_cutoff() -> datetime:
+        # rounded down to the window, so every call inside it asks the same query
+        cutoff: datetime = club_now() + timedelta(hours=1)
+        timestamp: int = int(cutoff.timestamp())
+        return datetime.fromtimestamp(timestamp - timestamp % future_meetings_window, CLUB_TZ)
@@ -1,15 +1,26 @@
+import copy
 from datetime import datetime
 
 
 from api.base.Base import Base
+from api.base.Dates import parse_api_datetime, club_now
+from api.bookings.Booking import Booking
 from api.members.Member import Member
 from api.places.Place import Place
 from api.tickets.Ticket import Ticket
 
 
 class Meeting(Base):
+    __slots__ = (
+        "_date_time", "_place", "_tickets", "_tickets_raw", "_name", "_can_be_booked",
+        "_tickets_by_tg_id", "_free_tickets",
+    )
+
+    # enough for the dates list, no tickets graph
+    list_fields: tuple[str, ...] = ("pk", "date_time", "place")
+
     def __init__(
-            self, name: str, date_time: str, can_be_booked: bool,
+            self, date_time: str, name: str = "", can_be_booked: bool = False,
             pk: int | None = None, **kwargs
     ):
         super().__init__(pk=pk)
@@ -17,26 +28,42 @@ class Meeting(Base):
         self._date_time: datetime | None = None
         self._place: Place | None = None
         self._tickets: list[Ticket] | None = None
+        # tickets are built on first access
+        self._tickets_raw: list[dict] | None = None
+        # built together with the tickets, with_booking changes a copy
+        self._tickets_by_tg_id: dict[int, Ticket] | None = None
+        self._free_tickets: list[Ticket] | None = None
 
         self._name: str = name
         self._can_be_booked: bool = can_be_booked
-        self._pk: int | None = pk
 
-        self._set_date_time(datetime.strptime(date_time, self._date_time_format_db))
+        self._set_date_time(parse_api_datetime(date_time))
 
         place: dict = kwargs.get("place") if "place" in kwargs else {}
         if place:
             self._set_place(place)
 
-        tickets: list[dict] = kwargs.get("tickets") if "tickets" in kwargs else []
-        self._set_tickets(tickets)
+        self._tickets_raw = kwargs.get("tickets") or []
 
     def get_place(self) -> Place:
         return self._place
 
     def get_tickets(self) -> list[Ticket]:
+        if self._tickets is None:
+            self._set_tickets(self._tickets_raw)
+            self._tickets_raw = None
         return self._tickets
 
+    def get_ticket_booking_pks(self) -> list[tuple[int, int | None]]:
+        if self._tickets is not None:
+            return [(t.get_pk(), t.get_booking_pk()) for t in self._tickets]
+
+        pks: list[tuple[int, int | None]] = []
+        for ticket in self._tickets_raw:
+            booking: list[dict] = ticket.get("booking") or []
+            pks.append((ticket.get("pk"), booking[-1].get("pk") if booking else None))
+        return pks
+
     def get_can_be_booked(self) -> bool:
         return self._can_be_booked
 
@@ -47,38 +74,46 @@ class Meeting(Base):
         return self._date_time
 
     def get_free_tickets(self) -> list[Ticket]:
-        return list(filter(lambda x: not x.has_booking(), self._tickets))
+        self._build_indexes()
+        return list(self._free_tickets)
 
     def get_busy_tickets(self) -> list[Ticket]:
-        return list(filter(lambda x: x.has_booking(), self._tickets))
+        return list(filter(lambda x: x.has_booking(), self.get_tickets()))
 
-    def get_ticket_by_td_id(self, tg_id: int) -> Ticket | None:
-        busy_tickets: list[Ticket] = self.get_busy_tickets()
-        if not busy_tickets:
-            return None
+    def get_cnt_free_tickets(self) -> int:
+        self._build_indexes()
+        return len(self._free_tickets)
 
-        member_ticket: list[Ticket] = list(filter(lambda x: x.get_booking_member() == tg_id, busy_tickets))
-        if not member_ticket:
-            return None
+    def get_cnt_busy_tickets(self) -> int:
+        self._build_indexes()
+        return len(self.get_tickets()) - len(self._free_tickets)
 
-        return member_ticket[0]
+    def get_ticket_by_td_id(self, tg_id: int) -> Ticket | None:
+        return self.get_ticket_by_tg_id(tg_id=tg_id)
 
     def check_booking_by_td_id(self, tg_id: int) -> bool:
         return bool(self.get_ticket_by_td_id(tg_id=tg_id))
 
     def get_ticket_by_tg_id(self, tg_id) -> Ticket | None:
-        busy_tickets: list[Ticket] = self.get_busy_tickets()
-        if not busy_tickets:
-            return None
-
-        check_result: list = list(filter(lambda x: x.get_booking_member().get_tg_id() == tg_id, busy_tickets))
-        return check_result[0] if check_result else None
+        self._build_indexes()
+        return self._tickets_by_tg_id.get(tg_id)
 
     def is_meeting_today(self):
-        return self.get_date_time().date() == datetime.today().date()
-
-    def add_booking(self):
-        pass
+        return self.get_date_time().date() == club_now().date()
+
+    def with_booking(self, ticket_pk: int, booking: Booking, member: Member | None = None) -> "Meeting":
+        meeting: Meeting = self._copy()
+        meeting._build_indexes()
+        ticket: Ticket | None = next((t for t in meeting._free_tickets if t.get_pk() == ticket_pk), None)
+        if not ticket:
+            return meeting
+
+        ticket.set_booking(booking)
+        meeting._free_tickets.remove(ticket)
+        member = member or booking.get_member()
+        if member:
+            meeting._tickets_by_tg_id[member.get_tg_id()] = ticket
+        return meeting
 
     def get_pk(self) -> int:
         return self._pk
@@ -89,6 +124,49 @@ class Meeting(Base):
     def _set_tickets(self, value: list[dict]):
         self._tickets: list[Ticket] = [Ticket(**t) for t in value]
 
+    def to_tuple(self) -> tuple:
+        return (
+            self._pk, self._name, self._date_time.isoformat(), self._can_be_booked,
+            self._place.to_tuple() if self._place else None,
+            [ticket.to_tuple() for ticket in self.get_tickets()],
+        )
+
+    @classmethod
+    def from_tuple(cls, data: tuple) -> "Meeting":
+        meeting: Meeting = cls.__new__(cls)
+        meeting._pk, meeting._name, date_time, meeting._can_be_booked, place, tickets = data
+        meeting._date_time = parse_api_datetime(date_time)
+        meeting._place = Place.from_tuple(place) if place else None
+        meeting._tickets = [Ticket.from_tuple(ticket) for ticket in tickets]
+        meeting._tickets_raw = None
+        meeting._tickets_by_tg_id = None
+        meeting._free_tickets = None
+        return meeting
+
+    def _build_indexes(self):
+        if self._free_tickets is not None:
+            return
+
+        self._tickets_by_tg_id = {}
+        self._free_tickets = []
+        for ticket in self.get_tickets():
+            if not ticket.has_booking():
+                self._free_tickets.append(ticket)
+                continue
+
+            member: Member | None = ticket.get_booking_member()
+            if member:
+                self._tickets_by_tg_id[member.get_tg_id()] = ticket
+
+    def _copy(self) -> "Meeting":
+        # cached meetings are shared between handlers, a change goes to a copy of the tickets
+        meeting: Meeting = copy.copy(self)
+        meeting._tickets = [copy.copy(ticket) for ticket in self.get_tickets()]
+        meeting._tickets_raw = None
+        meeting._tickets_by_tg_id = None
+        meeting._free_tickets = None
+        return meeting
+
     def _set_place(self, value: dict):
         self._place: Place = Place(**value)
 
@@ -0,0 +1,164 @@
+from typing import Awaitable, Callable
+
+from api.base.ApiErrors import ApiUnavailableError
+from api.base.EntityCache import EntityCache
+from api.meetings.Meeting import Meeting
+from api.settings import (
+    meetings_cache_size, meetings_cache_ttl, meetings_cache_stale_ttl, meetings_cache_stale_if_error_ttl,
+    future_meetings_cache_ttl,
+)
+
+
+# invalidation messages shared between the replicas: a meeting pk or this
+CLEAR = "clear"
+
+
+class MeetingsCache:
+    def __init__(self):
+        self._meetings: EntityCache = EntityCache(
+            maxsize=meetings_cache_size,
+            ttl=meetings_cache_ttl,
+            stale_ttl=meetings_cache_stale_ttl,
+            stale_if_error=(ApiUnavailableError,),
+            stale_if_error_ttl=meetings_cache_stale_if_error_ttl,
+        )
+        self._future: EntityCache = EntityCache(
+            maxsize=4,
+            ttl=future_meetings_cache_ttl,
+            stale_ttl=meetings_cache_stale_ttl,
+            stale_if_error=(ApiUnavailableError,),
+            stale_if_error_ttl=meetings_cache_stale_if_error_ttl,
+        )
+        self._ticket_meeting: dict[int, int] = {}
+        self._booking_meeting: dict[int, int] = {}
+        self._indexed: dict[int, tuple[list[int], list[int]]] = {}
+        # tells the other replicas, they keep their own copies
+        self._publish: Callable[[str], None] | None = None
+
+    def set_publisher(self, publish: Callable[[str], None]):
+        self._publish = publish
+
+    async def get_meeting(self, pk: int, loader: Callable[[], Awaitable[Meeting | None]]) -> Meeting | None:
+        async def load() -> Meeting | None:
+            meeting: Meeting | None = await loader()
+            if meeting:
+                self._index(meeting)
+            return meeting
+
+        return await self._meetings.get_or_load(pk, load)
+
+    async def get_meeting_fresh(self, pk: int, loader: Callable[[], Awaitable[Meeting | None]]) -> Meeting | None:
+        epoch: int = self._meetings.get_epoch()
+        meeting: Meeting | None = await loader()
+        if meeting:
+            self._index(meeting)
+            self._meetings.set(pk, meeting, epoch=epoch)
+        return meeting
+
+    async def get_meetings(
+            self, pks: list[int], loader: Callable[[list[int]], Awaitable[list[Meeting]]]
+    ) -> dict[int, Meeting]:
+        found: dict[int, Meeting] = {}
+        missing: list[int] = []
+        for pk in pks:
+            meeting: Meeting | None = self._meetings.peek(pk)
+            if meeting:
+                found[pk] = meeting
+            else:
+                missing.append(pk)
+
+        if missing:
+            epoch: int = self._meetings.get_epoch()
+            for meeting in await loader(missing):
+                self._index(meeting)
+                self._meetings.set(meeting.get_pk(), meeting, epoch=epoch)
+                found[meeting.get_pk()] = meeting
+
+        return found
+
+    async def get_future(
+            self, key: tuple, loader: Callable[[], Awaitable[list[Meeting]]], is_full: bool = True
+    ) -> list[Meeting]:
+        async def load() -> list[Meeting]:
+            epoch: int = self._meetings.get_epoch()
+            meetings: list[Meeting] = await loader()
+            # past meetings are not asked for anymore, their index entries would only pile up
+            self._prune([meeting.get_pk() for meeting in meetings])
+            if is_full:
+                for meeting in meetings:
+                    self._index(meeting)
+                    self._meetings.set(meeting.get_pk(), meeting, epoch=epoch)
+            return meetings
+
+        meetings: list[Meeting] = await self._future.get_or_load(key, load)
+        return list(meetings)
+
+    def invalidate_meeting(self, pk: int | None):
+        self._drop_meeting(pk)
+        self._broadcast(CLEAR if pk is None else str(pk))
+
+    def invalidate_ticket(self, ticket_pk: int):
+        meeting_pk: int | None = self._ticket_meeting.get(ticket_pk)
+        if meeting_pk is None:
+            return self.clear()
+        self.invalidate_meeting(meeting_pk)
+
+    def invalidate_booking(self, booking_pk: int):
+        meeting_pk: int | None = self._booking_meeting.get(booking_pk)
+        if meeting_pk is None:
+            return self.clear()
+        self.invalidate_meeting(meeting_pk)
+
+    def clear(self):
+        self.drop_all()
+        self._broadcast(CLEAR)
+
+    def apply_remote(self, message: str):
+        # from another replica, not broadcast again
+        if message == CLEAR:
+            self.drop_all()
+        elif message.isdigit():
+            self._drop_meeting(int(message))
+
+    def drop_all(self):
+        self._meetings.clear()
+        self._future.clear()
+
+    def _drop_meeting(self, pk: int | None):
+        if pk is not None:
+            self._meetings.invalidate(pk)
+        self._future.clear()
+
+    def _broadcast(self, message: str):
+        if self._publish is not None:
+            self._publish(message)
+
+    def _index(self, meeting: Meeting):
+        self._unindex(meeting.get_pk())
+        ticket_pks: list[int] = []
+        booking_pks: list[int] = []
+        for ticket_pk, booking_pk in meeting.get_ticket_booking_pks():
+            self._ticket_meeting[ticket_pk] = meeting.get_pk()
+            ticket_pks.append(ticket_pk)
+            if booking_pk is not None:
+                self._booking_meeting[booking_pk] = meeting.get_pk()
+                booking_pks.append(booking_pk)
+        self._indexed[meeting.get_pk()] = (ticket_pks, booking_pks)
+
+    def _unindex(self, meeting_pk: int):
+        ticket_pks, booking_pks = self._indexed.pop(meeting_pk, ([], []))
+        for ticket_pk in ticket_pks:
+            if self._ticket_meeting.get(ticket_pk) == meeting_pk:
+                del self._ticket_meeting[ticket_pk]
+        for booking_pk in booking_pks:
+            if self._booking_meeting.get(booking_pk) == meeting_pk:
+                del self._booking_meeting[booking_pk]
+
+    def _prune(self, meeting_pks: list[int]):
+        # an unknown ticket or booking falls back to clearing the whole cache, so dropping is safe
+        keep: set[int] = set(meeting_pks)
+        for meeting_pk in [pk for pk in self._indexed if pk not in keep]:
+            self._unindex(meeting_pk)
+
+
+meetings_cache = MeetingsCache()
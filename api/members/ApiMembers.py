@@ -1,7 +1,8 @@
-
+from typing import AsyncIterator
 
 from api.base.ApiBase import ApiBase, T_HOST
 from .Member import Member
+from .MembersCache import members_cache
 
 
 class ApiMember(ApiBase):
@@ -12,13 +13,24 @@ class ApiMember(ApiBase):
         members = await self._api_get_members()
         return [Member(**member) for member in members]
 
+    async def iter_members(self) -> AsyncIterator[Member]:
+        async for page in self._api_iter_pages("members"):
+            for member in page:
+                yield Member(**member)
+
     async def get_member_by_pk(self, pk: int) -> Member | None:
         member = await self._api_get_members(id=pk)
         return Member(**member[0]) if member else None
 
     async def get_member_by_tg_id(self, tg_id: int) -> Member | None:
-        member = await self._api_get_members(tg_id=tg_id)
-        return Member(**member[0]) if member else None
+        return await members_cache.get_member(tg_id, lambda: self._get_member_payload_by_tg_id(tg_id))
+
+    async def get_members_by_tg_ids(self, tg_ids: list[int]) -> list[Member | None]:
+        found: dict[int, Member] = await members_cache.get_members(
+            list(dict.fromkeys(tg_ids)),
+            self._get_members_payload_by_tg_ids,
+        )
+        return [found.get(tg_id) for tg_id in tg_ids]
 
     async def add_member(self, new_member: Member) -> Member:
         result: dict = await self._api_add_member(
@@ -28,6 +40,13 @@ class ApiMember(ApiBase):
             surname=new_member.get_surname(),
         )
         if result:
-            return Member(**result)
+            return await members_cache.upsert(result)
         else:
             raise
+
+    async def _get_member_payload_by_tg_id(self, tg_id: int) -> dict | None:
+        member = await self._api_get_members(tg_id=tg_id)
+        return member[0] if member else None
+
+    async def _get_members_payload_by_tg_ids(self, tg_ids: list[int]) -> list[dict]:
+        return await self._api_get_chunked(self._api_get_members, "tg_id__in", tg_ids)
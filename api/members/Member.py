@@ -4,6 +4,8 @@ from api.base.Base import Base
 
 
 class Member(Base):
+    __slots__ = ("_tg_id", "_login", "_name", "_surname", "_bookings")
+
     def __init__(
         self, tg_id: int, login: str, name: str, surname: str, pk: int | None = None, **kwargs
     ):
@@ -16,7 +18,6 @@ class Member(Base):
         self._login: str = login
         self._name: str = name
         self._surname: str = surname
-        self._pk: int | None = pk
 
         self._bookings: list[dict] = kwargs.get("bookings") if "bookings" in kwargs else []
 
@@ -45,3 +46,12 @@ class Member(Base):
             self.get_surname(),
         ]
         return " ".join([x for x in full_name_parts if x])
+
+    def to_tuple(self) -> tuple:
+        return self._pk, self._tg_id, self._login, self._name, self._surname, self._bookings
+
+    @classmethod
+    def from_tuple(cls, data: tuple) -> "Member":
+        member: Member = cls.__new__(cls)
+        member._pk, member._tg_id, member._login, member._name, member._surname, member._bookings = data
+        return member
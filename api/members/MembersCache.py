@@ -0,0 +1,159 @@
+from typing import Any, Awaitable, Callable
+
+from api.base.ApiErrors import ApiUnavailableError
+from api.base import Snapshot
+from api.base.EntityCache import EntityCache
+from api.members.Member import Member
+from api.settings import members_cache_size, members_cache_ttl, members_missing_ttl, members_redis_ttl
+
+
+MISSING = b"-"
+
+
+class MembersCache:
+    def __init__(self):
+        self._members: EntityCache = EntityCache(maxsize=members_cache_size, ttl=members_cache_ttl)
+        self._missing: EntityCache = EntityCache(maxsize=members_cache_size, ttl=members_missing_ttl)
+        self._redis: Any = None
+
+    def set_redis(self, redis_handler: Any):
+        self._redis = redis_handler
+
+    async def get_member(self, tg_id: int, loader: Callable[[], Awaitable[dict | None]]) -> Member | None:
+        member: Member | None = self._members.peek(tg_id)
+        if member:
+            return member
+        if self._missing.peek(tg_id):
+            return None
+
+        cached: bytes | None = await self._redis_get(tg_id)
+        if cached == MISSING:
+            self._missing.set(tg_id, True)
+            return None
+        elif cached:
+            member = self._load(cached)
+            if member:
+                self._members.set(tg_id, member)
+                return member
+
+        epoch: int = self._members.get_epoch()
+        try:
+            payload: dict | None = await loader()
+        except ApiUnavailableError:
+            member = self._members.get_last(tg_id)
+            if member is None:
+                raise
+            return member
+
+        if not payload:
+            self._missing.set(tg_id, True)
+            await self._redis_set(tg_id, MISSING, ttl=int(members_missing_ttl))
+            return None
+
+        member = Member(**payload)
+        self._members.set(tg_id, member, epoch=epoch)
+        await self._redis_set(tg_id, Snapshot.dumps(member), ttl=members_redis_ttl)
+        return member
+
+    async def get_members(
+            self, tg_ids: list[int], loader: Callable[[list[int]], Awaitable[list[dict]]]
+    ) -> dict[int, Member]:
+        found: dict[int, Member] = {}
+        missing: list[int] = []
+        for tg_id in tg_ids:
+            member: Member | None = self._members.peek(tg_id)
+            if member:
+                found[tg_id] = member
+            elif not self._missing.peek(tg_id):
+                missing.append(tg_id)
+
+        if missing:
+            missing = await self._redis_get_many(missing, found)
+        if not missing:
+            return found
+
+        epoch: int = self._members.get_epoch()
+        for payload in await loader(missing):
+            member = Member(**payload)
+            self._members.set(member.get_tg_id(), member, epoch=epoch)
+            await self._redis_set(member.get_tg_id(), Snapshot.dumps(member), ttl=members_redis_ttl)
+            found[member.get_tg_id()] = member
+
+        for tg_id in missing:
+            if tg_id not in found:
+                self._missing.set(tg_id, True)
+                await self._redis_set(tg_id, MISSING, ttl=int(members_missing_ttl))
+
+        return found
+
+    async def upsert(self, payload: dict) -> Member:
+        member: Member = Member(**payload)
+        tg_id: int = member.get_tg_id()
+        self._missing.invalidate(tg_id)
+        self._members.invalidate(tg_id)
+        self._members.set(tg_id, member)
+        await self._redis_set(tg_id, Snapshot.dumps(member), ttl=members_redis_ttl)
+        return member
+
+    async def invalidate(self, tg_id: int):
+        self._missing.invalidate(tg_id)
+        self._members.invalidate(tg_id)
+        if self._redis is not None:
+            try:
+                await self._redis.delete(self._get_key(tg_id))
+            except Exception:
+                pass
+
+    def _get_key(self, tg_id: int) -> str:
+        return self._redis.generate_key(["member", "tg", tg_id])
+
+    @staticmethod
+    def _load(value: bytes) -> Member | None:
+        try:
+            return Snapshot.loads(value)
+        except Snapshot.SnapshotVersionError:
+            # written by another schema version during a deploy, read from the backend instead
+            return None
+        except Snapshot.SnapshotError:
+            # not a snapshot of ours or a broken one, it is overwritten after the backend read
+            return None
+
+    async def _redis_get(self, tg_id: int) -> bytes | None:
+        if self._redis is None:
+            return None
+        try:
+            return await self._redis.get_bytes(self._get_key(tg_id))
+        except Exception:
+            # the redis tier is only an optimisation, the backend stays the source of truth
+            return None
+
+    async def _redis_get_many(self, tg_ids: list[int], found: dict[int, Member]) -> list[int]:
+        if self._redis is None:
+            return tg_ids
+        try:
+            values: list[bytes | None] = await self._redis.mget_bytes([self._get_key(tg_id) for tg_id in tg_ids])
+        except Exception:
+            return tg_ids
+
+        missing: list[int] = []
+        for tg_id, value in zip(tg_ids, values):
+            member: Member | None = self._load(value) if value and value != MISSING else None
+            if value == MISSING:
+                self._missing.set(tg_id, True)
+            elif member:
+                self._members.set(tg_id, member)
+                found[tg_id] = member
+            else:
+                missing.append(tg_id)
+        return missing
+
+    async def _redis_set(self, tg_id: int, value: bytes, ttl: int):
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set_bytes(self._get_key(tg_id), value, ex=ttl)
+        except Exception:
+            pass
+
+
+members_cache = MembersCache()
@@ -4,6 +4,8 @@ from api.base.Base import Base
 
 
 class Place(Base):
+    __slots__ = ("_name", "_address", "_link", "_description")
+
     def __init__(
             self, name: str, address: str, link: str,
             description: str, pk: int | None = None, **kwargs
@@ -14,7 +16,6 @@ class Place(Base):
         self._address: str = address
         self._link: str = link
         self._description: str = description
-        self._pk: int | None = pk
 
     def get_address(self) -> str:
         return self._address
@@ -30,3 +31,12 @@ class Place(Base):
 
     def get_pk(self) -> int:
         return self._pk
+
+    def to_tuple(self) -> tuple:
+        return self._pk, self._name, self._address, self._link, self._description
+
+    @classmethod
+    def from_tuple(cls, data: tuple) -> "Place":
+        place: Place = cls.__new__(cls)
+        place._pk, place._name, place._address, place._link, place._description = data
+        return place
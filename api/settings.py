@@ -1,2 +1,32 @@
 datetime_format_str: str = "%d %B %H:%M"
 datetime_format_str_api: str = "%Y-%m-%dT%H:%M:%S"
+
+api_pool_limit: int = 100
+api_pool_limit_per_host: int = 30
+api_keepalive_timeout: float = 30.0
+api_dns_cache_ttl: int = 300
+api_request_timeout: float = 10.0
+api_validators_cache_size: int = 256
+api_batch_size: int = 50
+api_page_size: int = 100
+
+meetings_cache_size: int = 256
+meetings_cache_ttl: float = 30.0
+meetings_cache_stale_ttl: float = 120.0
+meetings_cache_stale_if_error_ttl: float = 600.0
+future_meetings_cache_ttl: float = 30.0
+future_meetings_window: int = 300
+
+members_cache_size: int = 4096
+members_cache_ttl: float = 600.0
+members_missing_ttl: float = 30.0
+members_redis_ttl: int = 86400
+
+api_get_retries: int = 2
+api_backoff_base: float = 0.2
+api_backoff_cap: float = 2.0
+api_retry_after_max: float = 30.0
+api_breaker_failures: int = 5
+api_breaker_reset_timeout: float = 15.0
+
+club_timezone: str = "Europe/Moscow"
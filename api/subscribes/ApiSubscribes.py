@@ -1,3 +1,5 @@
+from typing import AsyncIterator
+
 from Subscribe import Subscribe
 from api.base.ApiBase import ApiBase, T_HOST
 from api.settings import datetime_format_str_api
@@ -11,6 +13,11 @@ class ApiSubscribes(ApiBase):
         subscribes = await self._api_get_subscribes()
         return [Subscribe(**json_subscribe) for json_subscribe in subscribes]
 
+    async def iter_subscribes(self) -> AsyncIterator[Subscribe]:
+        async for page in self._api_iter_pages("subscribes"):
+            for subscribe in page:
+                yield Subscribe(**subscribe)
+
     async def get_subscribe_by_pk(self, pk: int) -> Subscribe | None:
         subscribe = await self._api_get_subscribes(id=pk)
         return Subscribe(**subscribe[0]) if subscribe else None
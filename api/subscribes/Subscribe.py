@@ -1,10 +1,16 @@
 from datetime import datetime
 
 from api.base.Base import Base
+from api.base.Dates import parse_api_datetime
 from api.members.Member import Member
 
 
 class Subscribe(Base):
+    __slots__ = (
+        "_date_time", "_member", "_price", "_user_confirm_paid", "_is_paid", "_is_first", "_is_active",
+        "_cnt_meetings",
+    )
+
     def __init__(
             self, date_time: str, price: float, user_confirm_paid: bool, is_paid: bool, is_active: bool,
             is_first: bool, cnt_meetings: int, pk: int | None = None, **kwargs
@@ -20,9 +26,8 @@ class Subscribe(Base):
         self._is_first: bool = is_first
         self._is_active: bool = is_active
         self._cnt_meetings: int = cnt_meetings
-        self._pk: int | None = pk
 
-        self._set_date_time(datetime.strptime(date_time, self._date_time_format_db))
+        self._set_date_time(parse_api_datetime(date_time))
 
         member: dict = kwargs.get("member") if "member" in kwargs else {}
         if member:
@@ -66,3 +71,21 @@ class Subscribe(Base):
 
     def _set_member(self, value: dict):
         self._member: Member = Member(**value)
+
+    def to_tuple(self) -> tuple:
+        return (
+            self._pk, self._date_time.isoformat(), self._price, self._user_confirm_paid, self._is_paid,
+            self._is_first, self._is_active, self._cnt_meetings,
+            self._member.to_tuple() if self._member else None,
+        )
+
+    @classmethod
+    def from_tuple(cls, data: tuple) -> "Subscribe":
+        subscribe: Subscribe = cls.__new__(cls)
+        (
+            subscribe._pk, date_time, subscribe._price, subscribe._user_confirm_paid, subscribe._is_paid,
+            subscribe._is_first, subscribe._is_active, subscribe._cnt_meetings, member,
+        ) = data
+        subscribe._date_time = parse_api_datetime(date_time)
+        subscribe._member = Member.from_tuple(member) if member else None
+        return subscribe
@@ -1,3 +1,5 @@
+from typing import AsyncIterator
+
 from .Ticket import Ticket
 from api.base.ApiBase import ApiBase, T_HOST
 
@@ -9,3 +11,8 @@ class ApiTickets(ApiBase):
     async def get_tickets(self) -> list[Ticket]:
         tickets = await self._api_get_tickets()
         return [Ticket(**ticket) for ticket in tickets]
+
+    async def iter_tickets(self) -> AsyncIterator[Ticket]:
+        async for page in self._api_iter_pages("tickets"):
+            for ticket in page:
+                yield Ticket(**ticket)
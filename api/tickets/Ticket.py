@@ -6,23 +6,34 @@ from api.members.Member import Member
 
 
 class Ticket(Base):
+    __slots__ = ("_booking", "_booking_raw", "_price")
+
     def __init__(
             self, price: float, pk: int | None = None, **kwargs
     ):
         super().__init__(pk=pk)
 
         self._booking: Booking | None = None
+        # kept as is until the booking is asked for
+        self._booking_raw: dict | None = None
 
         self._price: float = price
-        self._pk: int | None = pk
 
         booking: list[dict] = kwargs.get("booking") if "booking" in kwargs else []
         if booking:
-            self._set_booking(booking.pop())
+            self._booking_raw = booking[-1]
 
     def get_booking(self) -> Booking | None:
+        if self._booking_raw is not None:
+            self._set_booking(self._booking_raw)
+            self._booking_raw = None
         return self._booking
 
+    def get_booking_pk(self) -> int | None:
+        if self._booking_raw is not None:
+            return self._booking_raw.get("pk")
+        return self._booking.get_pk() if self._booking else None
+
     def get_price(self) -> float:
         return self._price
 
@@ -30,11 +41,27 @@ class Ticket(Base):
         return self._pk
 
     def has_booking(self) -> bool:
-        return bool(self.get_booking())
+        return self._booking_raw is not None or self._booking is not None
 
     def get_booking_member(self) -> Member | None:
         booking: Booking | None = self.get_booking()
         return booking.get_member() if isinstance(booking, Booking) else None
 
+    def set_booking(self, value: Booking | None):
+        self._booking = value
+        self._booking_raw = None
+
     def _set_booking(self, value: dict):
         self._booking = Booking(**value)
+
+    def to_tuple(self) -> tuple:
+        booking: Booking | None = self.get_booking()
+        return self._pk, self._price, booking.to_tuple() if booking else None
+
+    @classmethod
+    def from_tuple(cls, data: tuple) -> "Ticket":
+        ticket: Ticket = cls.__new__(cls)
+        ticket._pk, ticket._price, booking = data
+        ticket._booking = Booking.from_tuple(booking) if booking else None
+        ticket._booking_raw = None
+        return ticket
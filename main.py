@@ -1,36 +1,100 @@
 import asyncio
 import json
-from datetime import datetime
-from typing import Any
+import logging
+import re
+import signal
+import time
+from datetime import datetime, timedelta
 
 from aiogram import Bot, Dispatcher, types, Router
 from aiogram.enums import ParseMode
-from aiogram.filters import Command
-from aiogram.types import User
+from aiogram.filters import Command, ExceptionTypeFilter
+from aiogram.types import ErrorEvent, User
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 from magic_filter import F
 
 from TgButtons import TgButtons
 from TgButtonsAdmin import TgButtonsAdmin
 from TgButtonsUser import TgButtonsUser
-from api.bookings.ApiBookings import ApiBookings
+from api.base.ApiBase import ApiBase
+from api.base.ApiErrors import ApiError, ApiResponseError
+from api.base.Dates import club_now
 from api.bookings.Booking import Booking
-from api.meetings.ApiMeetings import ApiMeetings
 from api.meetings.Meeting import Meeting
-from api.members.ApiMembers import ApiMember
+from api.meetings.MeetingsCache import meetings_cache
 from api.members.Member import Member
+from api.members.MembersCache import members_cache
 from clb_queries import ClbShowList, ClbShowDetail, ClbAdd, ClbDelete, Postfix, ClbConfirm
 from api.tickets.Ticket import Ticket
 from texts.Admins import Admins
 from texts.Errors import Errors
 from texts.Messages import Messages
-from settings import TOKEN, HOST, ADMIN_CHANEL_ID, REDIS_HOST, REDIS_PORT
-from api.settings import datetime_format_str_api
+from settings import (
+    TOKEN, ADMIN_CHANEL_ID, REDIS_HOST, REDIS_PORT, UPDATE_DEADLINE,
+    PENDING_TTL, PENDING_CLAIM_TIMEOUT, PENDING_STALE_AFTER, PENDING_SWEEP_INTERVAL, FSM_STATE_TTL, FSM_DATA_TTL,
+    NEAR_CACHE_SIZE, NEAR_CACHE_FALLBACK_TTL,
+    BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT,
+    SEAT_HOLD_TTL, SEAT_STATE_TTL, SEAT_RECONCILE_INTERVAL, CALLBACK_ANSWER_GRACE, SEND_GLOBAL_RATE,
+    STATS_INTERVAL,
+)
+from api.settings import datetime_format_str, datetime_format_str_api
+from utils.Deadline import DeadlineExceeded, finish_detached, wait_detached
+from utils.Middlewares import (
+    DeadlineMiddleware, DeadlineRequestMiddleware, CallbackAnswerMiddleware, answer_callback,
+)
+from utils.InvalidationBus import InvalidationBus
+from utils.NearCache import NearCache
+from utils.PendingSweeper import PendingSweeper, NOTIFIED, SKIPPED, DROP
+from utils.ReminderScheduler import ReminderScheduler, Reminder, TOMORROW
 from utils.RedisHandler import RedisHandler
-from utils.Service import Service
+from utils.SeatAllocator import SeatAllocator, SeatAlreadyHeld
+from utils.SendQueue import SendQueue, USER, ADMIN, BULK
+from utils.StatsReporter import StatsReporter
+from utils.Service import Service, api_members, api_meetings, api_bookings
+
+db_redis = RedisHandler(host=REDIS_HOST, port=REDIS_PORT)
+members_cache.set_redis(db_redis)
+near_cache = NearCache(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    prefixes=[
+        db_redis.get_prefix_confirm(name=Postfix.booking),
+        db_redis.get_prefix_delete(name=Postfix.booking),
+    ],
+    maxsize=NEAR_CACHE_SIZE,
+    fallback_ttl=NEAR_CACHE_FALLBACK_TTL,
+)
+db_redis.set_near_cache(near_cache)
+# a booking changed on one replica drops the meeting on all of them
+meetings_invalidation = InvalidationBus(
+    redis=db_redis,
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    channel=db_redis.generate_key(["invalidate", "meetings"]),
+    on_message=meetings_cache.apply_remote,
+    on_reset=meetings_cache.drop_all,
+)
+meetings_cache.set_publisher(meetings_invalidation.publish)
+seat_allocator = SeatAllocator(
+    redis=db_redis,
+    load_meetings=api_meetings.get_future_meetings_fresh,
+    load_meeting=api_meetings.get_meeting_by_pk_fresh,
+    hold_ttl=SEAT_HOLD_TTL,
+    state_ttl=SEAT_STATE_TTL,
+    reconcile_interval=SEAT_RECONCILE_INTERVAL,
+)
+fsm_storage = db_redis.get_fsm_storage(state_ttl=FSM_STATE_TTL, data_ttl=FSM_DATA_TTL)
 
 bot = Bot(token=TOKEN, parse_mode=ParseMode.MARKDOWN)
-dp = Dispatcher()
+bot.session.middleware(DeadlineRequestMiddleware())
+send_queue = SendQueue(bot=bot, global_rate=SEND_GLOBAL_RATE)
+# state lives in redis and updates of one user are serialized across all replicas
+dp = Dispatcher(storage=fsm_storage, events_isolation=fsm_storage.create_isolation())
+dp.update.outer_middleware(DeadlineMiddleware(seconds=UPDATE_DEADLINE))
+callback_answer_middleware = CallbackAnswerMiddleware(grace=CALLBACK_ANSWER_GRACE)
+dp.callback_query.outer_middleware(callback_answer_middleware)
 router = Router()
 dp.include_router(router)
 
@@ -38,12 +102,6 @@ text_msg = Messages()
 text_errors = Errors()
 text_admins = Admins()
 
-api_members = ApiMember(HOST)
-api_meetings = ApiMeetings(HOST)
-api_bookings = ApiBookings(HOST)
-
-db_redis = RedisHandler(host=REDIS_HOST, port=REDIS_PORT)
-
 
 @router.message(Command("start"))
 async def start(message: types.Message):
@@ -82,7 +140,7 @@ async def show_start_menu(callback: types.CallbackQuery):
 
 @router.callback_query(ClbShowList.filter(F.postfix == Postfix.dates))
 async def show_meetings_list(callback: types.CallbackQuery):
-    meetings: list[Meeting] = await api_meetings.get_future_meetings()
+    meetings: list[Meeting] = await api_meetings.get_future_meetings(fields=Meeting.list_fields)
     if not meetings:
         return await send_answer(
             callback=callback,
@@ -144,39 +202,52 @@ async def add_booking(callback: types.CallbackQuery, callback_data: ClbAdd):
         text: str = text_errors.strange_member()
         return await send_answer(callback=callback, text=text)
 
-    # todo система оповещений пользователей что скоро занятие
-    meeting: Meeting = await api_meetings.get_meeting_by_pk(pk=callback_data.pk)
+    # decisions about a booking are made on the backend state, not on a cached one
+    meeting: Meeting = await api_meetings.get_meeting_by_pk_fresh(pk=callback_data.pk)
     ticket: Ticket = meeting.get_ticket_by_tg_id(member.get_tg_id())
     if ticket:
         booking: Booking = ticket.get_booking()
         redis_key: str = db_redis.get_key_confirm(name=Postfix.booking, pk=booking.get_pk())
-        redis_booking: str = db_redis.get(redis_key)
+        redis_booking: str = await db_redis.get(redis_key)
 
         if booking.is_paid():
             text: str = text_msg.booking_success_pay_success()
-        elif redis_booking:
+        elif redis_booking and booking.is_user_confirm_paid():
             text: str = text_msg.booking_success_pay_confirm()
         else:
             text: str = text_msg.booking_already()
 
         return await send_answer(callback=callback, text=text)
 
-    free_tickets: list[Ticket] = meeting.get_free_tickets()
-    if not free_tickets:
-        return await send_answer(callback=callback, text=text_msg.no_free_tickets())
+    await after_(callback)
+    await finish_detached(finish_add_booking(callback, member, meeting))
+
+
+async def finish_add_booking(callback: types.CallbackQuery, member: Member, meeting: Meeting):
+    # every concurrent request gets its own ticket, not the first free one of a possibly stale meeting
+    try:
+        ticket_pk: int | None = await seat_allocator.allocate(meeting_pk=meeting.get_pk(), tg_id=member.get_tg_id())
+    except SeatAlreadyHeld:
+        return send_result(callback=callback, text=text_msg.booking_already())
+    if not ticket_pk:
+        return send_result(callback=callback, text=text_msg.no_free_tickets())
 
     btn_builder: InlineKeyboardBuilder = TgButtons.get_empty_builder()
     try:
-        await api_bookings.add_booking(
+        new_booking: Booking = await api_bookings.add_booking(
             new_booking=Booking(
-                date_time=datetime.now().strftime(datetime_format_str_api),
+                date_time=club_now().strftime(datetime_format_str_api),
                 is_paid=False,
                 user_confirm_paid=False,
             ),
-            ticket_id=free_tickets[0].get_pk(),
+            ticket_id=ticket_pk,
             member_id=member.get_pk(),
         )
     except Exception as e:
+        # only a 4xx surely did not book the seat, otherwise the hold expires and the backend tells
+        if isinstance(e, ApiResponseError) and e.status and 400 <= e.status < 500:
+            await seat_allocator.release(meeting_pk=meeting.get_pk(), ticket_pk=ticket_pk, tg_id=member.get_tg_id())
+        await seat_allocator.invalidate(meeting_pk=meeting.get_pk())
         text: str = Service.get_meeting_text(
             member,
             meeting,
@@ -189,6 +260,13 @@ async def add_booking(callback: types.CallbackQuery, callback_data: ClbAdd):
             pk=meeting.get_pk(),
         )
     else:
+        await seat_allocator.commit(meeting_pk=meeting.get_pk(), ticket_pk=ticket_pk)
+        meeting = meeting.with_booking(ticket_pk=ticket_pk, booking=new_booking, member=member)
+        await reminder_scheduler.schedule(
+            meeting_pk=meeting.get_pk(),
+            date_time=meeting.get_date_time(),
+            tg_id=member.get_tg_id(),
+        )
         text: str = Service.get_meeting_text(
             member,
             meeting,
@@ -212,12 +290,11 @@ async def add_booking(callback: types.CallbackQuery, callback_data: ClbAdd):
     btn_builder.adjust(1)
 
     await replace_last_msg(callback, text, btn_builder)
-    await after_(callback)
 
 
 @router.callback_query(ClbConfirm.filter(F.postfix == Postfix.confirm_booking))
 async def confirm_booking(callback: types.CallbackQuery, callback_data: ClbConfirm):
-    meeting: Meeting = await api_meetings.get_meeting_by_pk(pk=callback_data.pk)
+    meeting: Meeting = await api_meetings.get_meeting_by_pk_fresh(pk=callback_data.pk)
     ticket: Ticket = meeting.get_ticket_by_tg_id(tg_id=callback.from_user.id)
     if not ticket:
         return await send_answer(
@@ -228,18 +305,31 @@ async def confirm_booking(callback: types.CallbackQuery, callback_data: ClbConfi
     booking: Booking = ticket.get_booking()
     member: Member = ticket.get_booking_member()
 
-    redis_key: str = db_redis.get_key_confirm(name=Postfix.booking, pk=booking.get_pk())
-    redis_info = db_redis.get(redis_key)
-
-    if redis_info:
+    if booking.is_paid():
         return await send_answer(
             callback=callback,
-            text=text_msg.booking_success_pay_confirm()
+            text=text_msg.booking_success_pay_success()
         )
-    elif booking.is_paid():
-        return await send_answer(
+
+    await after_(callback)
+    await finish_detached(finish_confirm_booking(callback, meeting, booking, member))
+
+
+async def finish_confirm_booking(callback: types.CallbackQuery, meeting: Meeting, booking: Booking, member: Member):
+    redis_key: str = db_redis.get_key_confirm(name=Postfix.booking, pk=booking.get_pk())
+    redis_info_json: str = json.dumps({
+        "meeting_pk": meeting.get_pk(),
+        "member_tg_id": member.get_tg_id(),
+        "user_chat_id": callback.from_user.id,
+        "msg_to_user_id": callback.message.message_id,
+        "created_at": time.time(),
+    })
+    is_claimed: bool = await db_redis.claim(key=redis_key, value=redis_info_json, ex=PENDING_TTL)
+
+    if not is_claimed:
+        return send_result(
             callback=callback,
-            text=text_msg.booking_success_pay_success()
+            text=text_msg.booking_success_pay_confirm()
         )
     else:
         booking.set_user_confirm_paid(value=True)
@@ -248,7 +338,9 @@ async def confirm_booking(callback: types.CallbackQuery, callback_data: ClbConfi
         except Exception as e:
             # todo добавить логирование
             # todo вместо разработчкам писать ссылку на чат с леском (где все тьюторы)
-            return await send_answer(
+            # only our own request, one an admin already took stays with the admin
+            await db_redis.delete_if_equal(key=redis_key, value=redis_info_json)
+            return send_result(
                 callback=callback,
                 text=text_errors.booking_error()
             )
@@ -263,16 +355,6 @@ async def confirm_booking(callback: types.CallbackQuery, callback_data: ClbConfi
         btn_builder = TgButtonsUser.get_meeting(member=member, meeting=meeting)
         await replace_last_msg(callback=callback, btn_builder=btn_builder, text=text)
 
-        db_redis.set(
-            key=redis_key,
-            value=json.dumps({
-                "meeting_pk": meeting.get_pk(),
-                "member_tg_id": member.get_tg_id(),
-                "user_chat_id": callback.from_user.id,
-                "msg_to_user_id": callback.message.message_id,
-            })
-        )
-
         btn_builder_adm = TgButtons.get_empty_builder()
         btn_builder_adm = TgButtonsAdmin.add_confirm_payment(
             builder=btn_builder_adm,
@@ -294,14 +376,13 @@ async def confirm_booking(callback: types.CallbackQuery, callback_data: ClbConfi
             user_info=user_info,
             meeting_info=meeting.get_name(),
         )
-        await bot.send_message(
+        send_queue.send_message(
             chat_id=ADMIN_CHANEL_ID,
             text=notif_text,
             reply_markup=btn_builder_adm.as_markup(),
+            lane=ADMIN,
         )
 
-    await after_(callback)
-
 
 @router.callback_query(ClbDelete.filter(F.postfix == Postfix.confirm_booking))
 async def delete_booking_confirm(callback: types.CallbackQuery, callback_data: ClbDelete):
@@ -327,88 +408,104 @@ async def delete_booking_confirm(callback: types.CallbackQuery, callback_data: C
 
 @router.callback_query(ClbDelete.filter(F.postfix == Postfix.booking))
 async def delete_booking(callback: types.CallbackQuery, callback_data: ClbDelete):
-    meeting: Meeting = await api_meetings.get_meeting_by_pk(pk=callback_data.pk)
+    meeting: Meeting = await api_meetings.get_meeting_by_pk_fresh(pk=callback_data.pk)
     member_ticket: Ticket = meeting.get_ticket_by_tg_id(tg_id=callback.from_user.id)
     if not member_ticket:
         return await send_answer(
             callback=callback,
             text=text_msg.cancel_already()
         )
-    else:
-        booking: Booking = member_ticket.get_booking()
-        redis_key: str = db_redis.get_key_delete(name=Postfix.booking, pk=booking.get_pk())
-        redis_info: Any = db_redis.get(redis_key)
 
-        if redis_info:
-            return await send_answer(
+    await after_(callback)
+    await finish_detached(finish_delete_booking(callback, meeting, member_ticket))
+
+
+async def finish_delete_booking(callback: types.CallbackQuery, meeting: Meeting, member_ticket: Ticket):
+    booking: Booking = member_ticket.get_booking()
+    booking_pk: int = booking.get_pk()
+
+    if booking.is_paid() or booking.is_user_confirm_paid():
+        member: Member = member_ticket.get_booking_member()
+        # drops a pending payment confirmation, so admins can't confirm a cancelled booking
+        is_switched: bool = await db_redis.switch_to_refund(
+            confirm_key=db_redis.get_key_confirm(name=Postfix.booking, pk=booking_pk),
+            delete_key=db_redis.get_key_delete(name=Postfix.booking, pk=booking_pk),
+            value=json.dumps({
+                "booking_pk": booking_pk,
+                "meeting_pk": meeting.get_pk(),
+                "member_tg_id": member.get_tg_id(),
+                "user_chat_id": callback.from_user.id,
+                "msg_to_user_id": callback.message.message_id,
+                "created_at": time.time(),
+            }),
+            ex=PENDING_TTL,
+        )
+        if not is_switched:
+            return send_result(
                 callback=callback,
                 text=text_msg.cancel_with_return_money()
             )
-        elif booking.is_paid() or booking.is_user_confirm_paid():
-            if meeting.is_meeting_today():
-                text = text_msg.cancel_with_return_no_money()
-            else:
-                text = text_msg.cancel_with_return_money()
-
-            meetings: list[Meeting] = await api_meetings.get_future_meetings()
-            user_btn_builder = TgButtonsUser.get_meetings(meetings=meetings)
-            await replace_last_msg(callback=callback, btn_builder=user_btn_builder, text=text)
-
-            booking_pk: int = booking.get_pk()
-            btn_builder_adm: InlineKeyboardBuilder = TgButtons.get_empty_builder()
-            btn_builder_adm = TgButtonsAdmin.add_confirm_refund(
-                builder=btn_builder_adm,
-                pk=booking_pk
-            )
 
-            member: Member = member_ticket.get_booking_member()
-            db_redis.set(
-                key=redis_key,
-                value=json.dumps({
-                    "booking_pk": booking_pk,
-                    "member_tg_id": member.get_tg_id(),
-                    "user_chat_id": callback.from_user.id,
-                    "msg_to_user_id": callback.message.message_id,
-                })
-            )
-            if member.get_login():
-                user_info: str = f"[{member.get_full_name()}]({member.get_link()})"
-            else:
-                user_info: str = member.get_full_name()
-
-            notif_text: str = text_admins.confirm_cancel(
-                user_info=user_info,
-                meeting_info=meeting.get_name(),
-            )
+        if meeting.is_meeting_today():
+            text = text_msg.cancel_with_return_no_money()
+        else:
+            text = text_msg.cancel_with_return_money()
 
-            await bot.send_message(
-                chat_id=ADMIN_CHANEL_ID,
-                text=notif_text,
-                reply_markup=btn_builder_adm.as_markup(),
-            )
+        meetings: list[Meeting] = await api_meetings.get_future_meetings(fields=Meeting.list_fields)
+        user_btn_builder = TgButtonsUser.get_meetings(meetings=meetings)
+        await replace_last_msg(callback=callback, btn_builder=user_btn_builder, text=text)
+
+        btn_builder_adm: InlineKeyboardBuilder = TgButtons.get_empty_builder()
+        btn_builder_adm = TgButtonsAdmin.add_confirm_refund(
+            builder=btn_builder_adm,
+            pk=booking_pk
+        )
+
+        if member.get_login():
+            user_info: str = f"[{member.get_full_name()}]({member.get_link()})"
         else:
-            await api_bookings.delete_booking(booking)
+            user_info: str = member.get_full_name()
 
-            meetings: list[Meeting] = await api_meetings.get_future_meetings()
-            if not meetings:
-                text: str = text_msg.no_meetings_after_cancel()
-            else:
-                text: str = text_msg.meeting_dates_after_cancel()
+        notif_text: str = text_admins.confirm_cancel(
+            user_info=user_info,
+            meeting_info=meeting.get_name(),
+        )
 
-            btn_builder: InlineKeyboardBuilder = TgButtonsUser.get_meetings(meetings=meetings)
-            await replace_last_msg(
+        send_queue.send_message(
+            chat_id=ADMIN_CHANEL_ID,
+            text=notif_text,
+            reply_markup=btn_builder_adm.as_markup(),
+            lane=ADMIN,
+        )
+    else:
+        is_deleted: bool = await api_bookings.delete_booking(booking)
+        if not is_deleted:
+            return send_result(
                 callback=callback,
-                text=text,
-                btn_builder=btn_builder
+                text=f"{text_errors.smt_went_wrong()}\n{text_errors.try_one_more_time()}",
             )
 
-    await after_(callback=callback)
+        await seat_allocator.cancel(meeting_pk=meeting.get_pk(), tg_id=callback.from_user.id)
+        await reminder_scheduler.cancel(meeting_pk=meeting.get_pk(), tg_id=callback.from_user.id)
+
+        meetings: list[Meeting] = await api_meetings.get_future_meetings(fields=Meeting.list_fields)
+        if not meetings:
+            text: str = text_msg.no_meetings_after_cancel()
+        else:
+            text: str = text_msg.meeting_dates_after_cancel()
+
+        btn_builder: InlineKeyboardBuilder = TgButtonsUser.get_meetings(meetings=meetings)
+        await replace_last_msg(
+            callback=callback,
+            text=text,
+            btn_builder=btn_builder
+        )
 
 
 @router.callback_query(ClbConfirm.filter(F.postfix == Postfix.confirm_booking_adm))
 async def confirm_booking_admin(callback: types.CallbackQuery, callback_data: ClbConfirm):
     redis_key: str = db_redis.get_key_confirm(name=Postfix.booking, pk=callback_data.pk)
-    redis_info_json: str = db_redis.get(redis_key)
+    redis_info_json: str | None = await db_redis.get(redis_key)
 
     if not redis_info_json:
         await replace_last_msg(
@@ -418,6 +515,7 @@ async def confirm_booking_admin(callback: types.CallbackQuery, callback_data: Cl
         )
         return await after_(callback)
 
+    # checked before the claim, a request that can't be processed stays as it is
     redis_info: dict = json.loads(redis_info_json)
     meeting_pk: int | None = redis_info.get("meeting_pk", None)
     member_tg_id: int | None = redis_info.get("member_tg_id", None)
@@ -429,18 +527,39 @@ async def confirm_booking_admin(callback: types.CallbackQuery, callback_data: Cl
         )
         return await after_(callback)
 
-    booking: Booking = await api_bookings.get_booking_by_pk(pk=callback_data.pk)
+    await after_(callback)
+    await finish_detached(finish_confirm_booking_admin(callback, callback_data, redis_key, redis_info_json))
+
+
+async def finish_confirm_booking_admin(
+        callback: types.CallbackQuery, callback_data: ClbConfirm, redis_key: str, redis_info_json: str,
+):
+    claimed_json: str | None = await claim_pending(redis_key, redis_info_json)
+    if not claimed_json:
+        return send_result(callback=callback, text=text_admins.in_progress())
+
+    redis_info: dict = json.loads(redis_info_json)
+    meeting_pk: int = redis_info["meeting_pk"]
+    try:
+        booking: Booking = await api_bookings.get_booking_by_pk(pk=callback_data.pk)
+        if booking:
+            booking.set_is_paid(True)
+            _ = await api_bookings.update_booking(booking)
+    except Exception:
+        # give the pending confirmation back, so the admin can retry
+        await release_pending(redis_key, claimed_json, redis_info_json)
+        raise
+
     if not booking:
+        await release_pending(redis_key, claimed_json, redis_info_json)
         await replace_last_msg(
             callback=callback,
             text=callback.message.md_text + f"\n\n{text_admins.error()}, не нашел бронь, может позже",
             btn_builder=TgButtons.get_empty_builder(),
         )
-        return await after_(callback)
+        return
 
-    booking.set_is_paid(True)
-    _ = await api_bookings.update_booking(booking)
-    db_redis.delete(redis_key)
+    await db_redis.delete_if_equal(key=redis_key, value=claimed_json)
 
     user_chat_id = redis_info.get("user_chat_id", None)
     msg_to_user_id = redis_info.get("msg_to_user_id", None)
@@ -451,9 +570,10 @@ async def confirm_booking_admin(callback: types.CallbackQuery, callback_data: Cl
         member = booking.get_member()
         meeting = await api_meetings.get_meeting_by_pk(pk=meeting_pk)
 
-        await bot.delete_message(
+        send_queue.delete_message(
             chat_id=user_chat_id,
-            message_id=msg_to_user_id
+            message_id=msg_to_user_id,
+            lane=USER,
         )
         text = Service.get_meeting_text(
             member,
@@ -468,10 +588,11 @@ async def confirm_booking_admin(callback: types.CallbackQuery, callback_data: Cl
         )
         btn_builder.adjust(1)
 
-        await bot.send_message(
+        send_queue.send_message(
             text=text,
             chat_id=user_chat_id,
             reply_markup=btn_builder.as_markup(),
+            lane=USER,
         )
 
         await replace_last_msg(
@@ -480,8 +601,6 @@ async def confirm_booking_admin(callback: types.CallbackQuery, callback_data: Cl
             btn_builder=TgButtons.get_empty_builder()
         )
 
-    await after_(callback)
-
 
 @router.callback_query(ClbDelete.filter(F.postfix == Postfix.booking_adm))
 async def delete_booking_admin(callback: types.CallbackQuery, callback_data: ClbDelete):
@@ -489,39 +608,70 @@ async def delete_booking_admin(callback: types.CallbackQuery, callback_data: Clb
     # todo подумать как сделать оповещения о бронировании и отмене
     booking_pk: int = callback_data.pk
 
-    redis_key: str = db_redis.get_key_delete(name=Postfix.booking, pk=booking_pk)
-    redis_info_json: str = db_redis.get(redis_key)
-
-    if not redis_info_json:
-        redis_key: str = db_redis.get_key_confirm(name=Postfix.booking, pk=booking_pk)
-        redis_info_json: str = db_redis.get(redis_key)
-
-    if not redis_info_json:
-        await bot.send_message(
+    redis_keys: list[str] = [
+        db_redis.get_key_delete(name=Postfix.booking, pk=booking_pk),
+        db_redis.get_key_confirm(name=Postfix.booking, pk=booking_pk),
+    ]
+    # a pending refund goes first, a pending confirmation is cancelled together with the booking
+    found: list[tuple[str, str]] = [
+        (key, value) for key, value in zip(redis_keys, await db_redis.mget(redis_keys)) if value
+    ]
+
+    if not found:
+        send_queue.send_message(
             chat_id=ADMIN_CHANEL_ID,
             text=f"{text_admins.error()}, кароч в redis нет инфы про отмену",
+            lane=ADMIN,
         )
         return await after_(callback)
 
+    # checked before the claim, a request that can't be processed stays as it is
+    redis_key, redis_info_json = found[0]
     redis_info: dict = json.loads(redis_info_json)
     member_tg_id: int | None = redis_info.get("member_tg_id", None)
     if not booking_pk or not member_tg_id:
-        await bot.send_message(
+        send_queue.send_message(
             chat_id=ADMIN_CHANEL_ID,
             text=f"{text_admins.error()}, не нашел PK брони или tg id юзера, может позже",
+            lane=ADMIN,
         )
         return await after_(callback)
 
-    booking: Booking = await api_bookings.get_booking_by_pk(pk=booking_pk)
+    await after_(callback)
+    await finish_detached(finish_delete_booking_admin(callback, booking_pk, redis_key, redis_info_json))
+
+
+async def finish_delete_booking_admin(
+        callback: types.CallbackQuery, booking_pk: int, redis_key: str, redis_info_json: str,
+):
+    claimed_json: str | None = await claim_pending(redis_key, redis_info_json)
+    if not claimed_json:
+        return send_result(callback=callback, text=text_admins.in_progress())
+
+    redis_info: dict = json.loads(redis_info_json)
+    member_tg_id: int = redis_info["member_tg_id"]
+    try:
+        booking: Booking = await api_bookings.get_booking_by_pk(pk=booking_pk)
+        if booking:
+            await api_bookings.delete_booking(booking)
+    except Exception:
+        await release_pending(redis_key, claimed_json, redis_info_json)
+        raise
+
     if not booking:
-        await bot.send_message(
+        await release_pending(redis_key, claimed_json, redis_info_json)
+        send_queue.send_message(
             chat_id=ADMIN_CHANEL_ID,
             text=f"{text_admins.error()}, не нашел бронь, может позже",
+            lane=ADMIN,
         )
-        return await after_(callback)
+        return
 
-    db_redis.delete(redis_key)
-    await api_bookings.delete_booking(booking)
+    await db_redis.delete_if_equal(key=redis_key, value=claimed_json)
+
+    if redis_info.get("meeting_pk", None):
+        await seat_allocator.cancel(meeting_pk=redis_info["meeting_pk"], tg_id=member_tg_id)
+        await reminder_scheduler.cancel(meeting_pk=redis_info["meeting_pk"], tg_id=member_tg_id)
 
     user_chat_id = redis_info.get("user_chat_id", None)
     msg_to_user_id = redis_info.get("msg_to_user_id", None)
@@ -529,9 +679,10 @@ async def delete_booking_admin(callback: types.CallbackQuery, callback_data: Clb
         # todo дописать отправку текста с ошибкой (подумать куда)
         pass
     else:
-        await bot.delete_message(
+        send_queue.delete_message(
             chat_id=user_chat_id,
-            message_id=msg_to_user_id
+            message_id=msg_to_user_id,
+            lane=USER,
         )
 
     if booking.is_paid():
@@ -541,12 +692,13 @@ async def delete_booking_admin(callback: types.CallbackQuery, callback_data: Clb
         text = text_admins.booking_cancel_success_check_money()
         usr_text = text_msg.cancel_by_admin()
 
-    meetings = await api_meetings.get_future_meetings()
+    meetings = await api_meetings.get_future_meetings(fields=Meeting.list_fields)
     btn_builder = TgButtonsUser.get_meetings(meetings)
-    await bot.send_message(
+    send_queue.send_message(
         chat_id=member_tg_id,
         text=usr_text,
-        reply_markup=btn_builder.as_markup()
+        reply_markup=btn_builder.as_markup(),
+        lane=USER,
     )
 
     await replace_last_msg(
@@ -555,7 +707,20 @@ async def delete_booking_admin(callback: types.CallbackQuery, callback_data: Clb
         text=callback.message.md_text + f"\n\n{text}"
     )
 
-    await after_(callback)
+
+@router.error(ExceptionTypeFilter(ApiError))
+async def api_error(event: ErrorEvent):
+    callback: types.CallbackQuery | None = event.update.callback_query
+    if callback:
+        await send_answer(callback=callback, text=text_errors.backend_unavailable())
+
+
+@router.error(ExceptionTypeFilter(DeadlineExceeded))
+async def deadline_error(event: ErrorEvent):
+    callback: types.CallbackQuery | None = event.update.callback_query
+    if callback:
+        # nothing to say if the spinner is already cleared
+        await answer_callback(callback, text=text_msg.still_processing())
 
 
 async def replace_last_msg(callback: types.CallbackQuery, text: str, btn_builder: InlineKeyboardBuilder):
@@ -567,18 +732,214 @@ async def replace_last_msg(callback: types.CallbackQuery, text: str, btn_builder
     )
 
 
+async def claim_pending(redis_key: str, redis_info_json: str) -> str | None:
+    # the request is marked as taken instead of deleted, so a failed attempt can give back exactly what it took
+    redis_info: dict = json.loads(redis_info_json)
+    if time.time() - redis_info.get("processing_at", 0) < PENDING_CLAIM_TIMEOUT:
+        return None
+
+    claimed_json: str = json.dumps({**redis_info, "processing_at": time.time()})
+    if await db_redis.replace_if_equal(key=redis_key, old_value=redis_info_json, new_value=claimed_json):
+        return claimed_json
+    return None
+
+
+async def release_pending(redis_key: str, claimed_json: str, redis_info_json: str):
+    # only if it is still ours, a request moved by switch_to_refund is not brought back
+    await db_redis.replace_if_equal(key=redis_key, old_value=claimed_json, new_value=redis_info_json)
+
+
 async def send_answer(callback: types.CallbackQuery, text: str):
-    await callback.answer(text=text, show_alert=True)
-    await after_(callback=callback)
+    if not await answer_callback(callback, text=text, show_alert=True):
+        # the callback was acknowledged early, an alert can't be shown anymore
+        send_queue.send_message(chat_id=callback.from_user.id, text=text, lane=USER)
+
+
+def send_result(callback: types.CallbackQuery, text: str):
+    # the detached part runs after the callback was answered, its results come as messages
+    send_queue.send_message(chat_id=callback.from_user.id, text=text, lane=USER)
 
 
 async def after_(callback: types.CallbackQuery) -> None:
-    await bot.answer_callback_query(callback.id)
+    await answer_callback(callback)
+
+
+async def remind_pending(redis_key: str, redis_info: dict) -> str:
+    booking_pk: int | None = db_redis.get_pk_from_key(redis_key)
+    booking: Booking | None = await api_bookings.get_booking_by_pk(pk=booking_pk) if booking_pk else None
+    if not booking:
+        return DROP
+
+    is_confirm: bool = db_redis.is_key_confirm(redis_key)
+    if is_confirm and (booking.is_paid() or not booking.is_user_confirm_paid()):
+        return DROP
+
+    member_tg_id: int | None = redis_info.get("member_tg_id", None)
+    meeting_pk: int | None = redis_info.get("meeting_pk", None)
+    if not member_tg_id or not meeting_pk:
+        return SKIPPED
+
+    member: Member | None = await api_members.get_member_by_tg_id(tg_id=member_tg_id)
+    meeting: Meeting | None = await api_meetings.get_meeting_by_pk(pk=meeting_pk)
+    if not member or not meeting:
+        return SKIPPED
+
+    if member.get_login():
+        user_info: str = f"[{member.get_full_name()}]({member.get_link()})"
+    else:
+        user_info: str = member.get_full_name()
+
+    btn_builder_adm: InlineKeyboardBuilder = TgButtons.get_empty_builder()
+    if is_confirm:
+        notif_text: str = text_admins.confirm_pay(user_info=user_info, meeting_info=meeting.get_name())
+        btn_builder_adm = TgButtonsAdmin.add_confirm_payment(builder=btn_builder_adm, pk=booking_pk)
+        btn_builder_adm = TgButtonsAdmin.add_booking_cancel(builder=btn_builder_adm, pk=booking_pk)
+    else:
+        notif_text: str = text_admins.confirm_cancel(user_info=user_info, meeting_info=meeting.get_name())
+        btn_builder_adm = TgButtonsAdmin.add_confirm_refund(builder=btn_builder_adm, pk=booking_pk)
+    btn_builder_adm.adjust(1)
+
+    send_queue.send_message(
+        chat_id=ADMIN_CHANEL_ID,
+        text=text_admins.reminder(notif_text),
+        reply_markup=btn_builder_adm.as_markup(),
+        lane=ADMIN,
+    )
+    return NOTIFIED
+
+
+pending_sweeper = PendingSweeper(
+    redis=db_redis,
+    patterns=[
+        db_redis.get_pattern_confirm(name=Postfix.booking),
+        db_redis.get_pattern_delete(name=Postfix.booking),
+    ],
+    on_stale=remind_pending,
+    interval=PENDING_SWEEP_INTERVAL,
+    stale_after=PENDING_STALE_AFTER,
+    ttl=PENDING_TTL,
+    claim_timeout=PENDING_CLAIM_TIMEOUT,
+)
+
+
+async def send_reminders(reminders: list[Reminder]) -> None:
+    # one batched fetch for the whole batch, the meetings come from the cache mostly
+    meetings: list[Meeting | None] = await api_meetings.get_meetings_by_pks([x.meeting_pk for x in reminders])
+    now: datetime = club_now()
+    for reminder, meeting in zip(reminders, meetings):
+        if not meeting or meeting.get_date_time() <= now or not meeting.get_ticket_by_tg_id(reminder.tg_id):
+            continue
+
+        # claimed late, e.g. after a long downtime: "tomorrow" would be a lie on the meeting day
+        if reminder.kind == TOMORROW and meeting.get_date_time().date() != (now + timedelta(days=1)).date():
+            continue
+
+        meeting_date: str = meeting.get_date_time().strftime(datetime_format_str)
+        if reminder.kind == TOMORROW:
+            text: str = text_msg.reminder_tomorrow(meeting_name=meeting.get_name(), datetime_str=meeting_date)
+        else:
+            text: str = text_msg.reminder_soon(meeting_name=meeting.get_name(), datetime_str=meeting_date)
+        send_queue.send_message(chat_id=reminder.tg_id, text=text, lane=BULK)
+
+
+reminder_scheduler = ReminderScheduler(redis=db_redis, on_due=send_reminders)
+
+stats_reporter = StatsReporter(
+    sources={
+        "api_coalescing": ApiBase.get_coalescing_stats,
+        "pending": pending_sweeper.get_stats,
+        "near_cache": near_cache.get_stats,
+        "meetings_invalidation": meetings_invalidation.get_stats,
+        "seats": seat_allocator.get_stats,
+        "send_queue": send_queue.get_stats,
+        "reminders": reminder_scheduler.get_stats,
+        "callback_answers": callback_answer_middleware.get_stats,
+    },
+    interval=STATS_INTERVAL,
+)
+
+
+async def on_startup() -> None:
+    await ApiBase.start_session()
+    send_queue.start()
+    near_cache.start()
+    meetings_invalidation.start()
+    pending_sweeper.start()
+    seat_allocator.start()
+    reminder_scheduler.start()
+    stats_reporter.start()
+
+
+async def on_shutdown() -> None:
+    await wait_detached()
+    await stats_reporter.stop()
+    await reminder_scheduler.stop()
+    await seat_allocator.stop()
+    await pending_sweeper.stop()
+    await meetings_invalidation.stop()
+    await near_cache.stop()
+    await send_queue.stop()
+    await ApiBase.close_session()
+    await db_redis.close()
+
+
+async def set_webhook() -> None:
+    await bot.set_webhook(
+        url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+
+
+async def run_webhook() -> None:
+    app = web.Application()
+    # requests without the X-Telegram-Bot-Api-Secret-Token header we gave telegram are rejected
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET).register(app, path=WEBHOOK_PATH)
+    # runs the dispatcher startup/shutdown handlers together with the app
+    setup_application(app, dp, bot=bot)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host=WEBAPP_HOST, port=WEBAPP_PORT).start()
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
+        # start_polling closes it itself, the webhook app does not
+        await bot.session.close()
+
+
+def check_webhook_settings() -> None:
+    # checked before anything starts, telegram would only fail on the first update otherwise
+    if not WEBHOOK_URL or not WEBHOOK_URL.startswith("https://"):
+        raise RuntimeError("BOT_MODE=webhook needs WEBHOOK_URL with the public https address of the bot")
+    if not WEBHOOK_SECRET or not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", WEBHOOK_SECRET):
+        raise RuntimeError("BOT_MODE=webhook needs WEBHOOK_SECRET of 1-256 characters A-Z, a-z, 0-9, _ and -")
 
 
 async def main() -> None:
-    await dp.start_polling(bot)
+    if BOT_MODE not in ("polling", "webhook"):
+        raise RuntimeError(f"unknown BOT_MODE {BOT_MODE!r}, expected polling or webhook")
+    if BOT_MODE == "webhook":
+        check_webhook_settings()
+
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    if BOT_MODE == "webhook":
+        dp.startup.register(set_webhook)
+        await run_webhook()
+    else:
+        # telegram refuses getUpdates while a webhook is set
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    logging.getLogger("stats").setLevel(logging.INFO)
     asyncio.run(main())
@@ -12,3 +12,26 @@ HOST = os.getenv("HOST")
 ADMIN_CHANEL_ID = os.getenv("ADMIN_CHANEL_ID")
 REDIS_HOST = os.getenv("REDIS_HOST")
 REDIS_PORT = os.getenv("REDIS_PORT")
+UPDATE_DEADLINE = float(os.getenv("UPDATE_DEADLINE", 5))
+PENDING_TTL = int(os.getenv("PENDING_TTL", 7 * 24 * 60 * 60))
+PENDING_STALE_AFTER = float(os.getenv("PENDING_STALE_AFTER", 6 * 60 * 60))
+PENDING_SWEEP_INTERVAL = float(os.getenv("PENDING_SWEEP_INTERVAL", 5 * 60))
+PENDING_CLAIM_TIMEOUT = float(os.getenv("PENDING_CLAIM_TIMEOUT", 2 * 60))
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", 24 * 60 * 60))
+FSM_DATA_TTL = int(os.getenv("FSM_DATA_TTL", 24 * 60 * 60))
+NEAR_CACHE_SIZE = int(os.getenv("NEAR_CACHE_SIZE", 4096))
+NEAR_CACHE_FALLBACK_TTL = float(os.getenv("NEAR_CACHE_FALLBACK_TTL", 2))
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", 8080))
+SEAT_HOLD_TTL = int(os.getenv("SEAT_HOLD_TTL", 60))
+SEAT_STATE_TTL = int(os.getenv("SEAT_STATE_TTL", 10 * 60))
+SEAT_RECONCILE_INTERVAL = float(os.getenv("SEAT_RECONCILE_INTERVAL", 60))
+CALLBACK_ANSWER_GRACE = float(os.getenv("CALLBACK_ANSWER_GRACE", 0.5))
+# telegram allows ~30 messages a second per bot, divide it between the replicas
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", 30))
+# how often the component counters are logged, 0 turns it off
+STATS_INTERVAL = float(os.getenv("STATS_INTERVAL", 60))
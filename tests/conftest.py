@@ -0,0 +1,20 @@
+import pytest
+
+
+@pytest.fixture
+def redis_handler(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    pytest.importorskip("aiogram")
+
+    from utils import RedisHandler as redis_handler_module
+
+    # both clients of the handler talk to one in-memory server that runs the lua scripts
+    server = fakeredis.FakeServer()
+
+    def make_redis(connection_pool):
+        decode_responses: bool = connection_pool.connection_kwargs.get("decode_responses", False)
+        return fakeredis.aioredis.FakeRedis(server=server, decode_responses=decode_responses)
+
+    monkeypatch.setattr(redis_handler_module.aioredis, "Redis", make_redis)
+    return redis_handler_module.RedisHandler("localhost", 6379)
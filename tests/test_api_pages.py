@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from api.base import ApiBase as api_base_module
+from api.base.ApiBase import ApiBase
+
+
+def collect(api: ApiBase, page_size: int) -> list[dict]:
+    async def run() -> list[dict]:
+        items: list[dict] = []
+        async for page in api._api_iter_pages("members", page_size=page_size):
+            items += page
+        return items
+
+    return asyncio.run(run())
+
+
+def stub_api_get(monkeypatch, get_page) -> list[str]:
+    urls: list[str] = []
+
+    async def api_get(url: str, use_validators: bool = True):
+        urls.append(url)
+        params: dict = dict(part.split("=") for part in url.split("?", 1)[1].split("&"))
+        return get_page(int(params["limit"]), int(params["offset"]))
+
+    monkeypatch.setattr(api_base_module, "api_get", api_get)
+    return urls
+
+
+ROWS: list[dict] = [{"pk": pk} for pk in range(150)]
+
+
+def test_paginated_list(monkeypatch):
+    urls: list[str] = stub_api_get(monkeypatch, lambda limit, offset: ROWS[offset:offset + limit])
+
+    assert collect(ApiBase("http://backend"), page_size=50) == ROWS
+    assert len(urls) == 4
+
+
+def test_envelope(monkeypatch):
+    def get_page(limit: int, offset: int) -> dict:
+        return {"results": ROWS[offset:offset + limit], "next": "more" if offset + limit < len(ROWS) else None}
+
+    urls: list[str] = stub_api_get(monkeypatch, get_page)
+
+    assert collect(ApiBase("http://backend"), page_size=100) == ROWS
+    assert len(urls) == 2
+
+
+def test_longer_than_a_page_is_not_paginated(monkeypatch):
+    urls: list[str] = stub_api_get(monkeypatch, lambda limit, offset: ROWS)
+
+    assert collect(ApiBase("http://backend"), page_size=100) == ROWS
+    assert len(urls) == 1
+
+
+def test_repeated_page_stops(monkeypatch):
+    urls: list[str] = stub_api_get(monkeypatch, lambda limit, offset: ROWS)
+
+    assert collect(ApiBase("http://backend"), page_size=150) == ROWS
+    assert len(urls) == 2
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+
+def test_replace_if_equal(redis_handler):
+    async def run():
+        await redis_handler.set("confirm_1", json.dumps({"processing_at": None}), ex=600)
+
+        assert await redis_handler.replace_if_equal("confirm_1", json.dumps({"processing_at": None}), "claimed")
+        assert await redis_handler.get("confirm_1") == "claimed"
+        # the ttl is kept when no new one is given
+        assert 0 < await redis_handler.db_redis.ttl("confirm_1") <= 600
+
+    asyncio.run(run())
+
+
+def test_replace_if_equal_lost_race(redis_handler):
+    async def run():
+        await redis_handler.set("confirm_1", "first")
+        seen: str = await redis_handler.get("confirm_1")
+        # another replica claimed it between our read and write
+        assert await redis_handler.replace_if_equal("confirm_1", seen, "other")
+
+        assert not await redis_handler.replace_if_equal("confirm_1", seen, "mine")
+        assert await redis_handler.get("confirm_1") == "other"
+        assert not await redis_handler.replace_if_equal("missing", "first", "mine")
+        assert await redis_handler.get("missing") is None
+
+    asyncio.run(run())
+
+
+def test_delete_if_equal(redis_handler):
+    async def run():
+        await redis_handler.set("confirm_1", "mine")
+        assert not await redis_handler.delete_if_equal("confirm_1", "theirs")
+        assert await redis_handler.get("confirm_1") == "mine"
+
+        assert await redis_handler.delete_if_equal("confirm_1", "mine")
+        assert await redis_handler.get("confirm_1") is None
+
+    asyncio.run(run())
+
+
+def test_switch_to_refund(redis_handler):
+    async def run():
+        await redis_handler.set("confirm_1", "booking")
+
+        assert await redis_handler.switch_to_refund("confirm_1", "delete_1", "refund", ex=600)
+        assert await redis_handler.get("confirm_1") is None
+        assert await redis_handler.get("delete_1") == "refund"
+
+        # a refund already pending is not replaced and the confirmation stays
+        await redis_handler.set("confirm_1", "booking")
+        assert not await redis_handler.switch_to_refund("confirm_1", "delete_1", "other", ex=600)
+        assert await redis_handler.get("confirm_1") == "booking"
+        assert await redis_handler.get("delete_1") == "refund"
+
+    asyncio.run(run())
+
+
+def test_claim(redis_handler):
+    async def run():
+        assert await redis_handler.claim("claim_1", "first", ex=60)
+        assert not await redis_handler.claim("claim_1", "second", ex=60)
+        assert await redis_handler.get("claim_1") == "first"
+
+    asyncio.run(run())
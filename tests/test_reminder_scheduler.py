@@ -0,0 +1,98 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from utils.ReminderScheduler import TOMORROW, Reminder, ReminderScheduler
+
+
+def make_scheduler(redis_handler, sent: list[str]) -> ReminderScheduler:
+    async def on_due(reminders: list[Reminder]):
+        sent.extend(reminder.to_key() for reminder in reminders)
+
+    return ReminderScheduler(redis_handler, on_due=on_due, lookahead=60, claim_timeout=300)
+
+
+async def schedule_tomorrow(scheduler: ReminderScheduler, now: float) -> str:
+    # only the day-before reminder falls into the lookahead
+    date_time: datetime = datetime.fromtimestamp(now, tz=timezone.utc) + timedelta(days=1, seconds=30)
+    await scheduler.schedule(meeting_pk=5, date_time=date_time, tg_id=1001)
+    return Reminder(meeting_pk=5, tg_id=1001, kind=TOMORROW).to_key()
+
+
+def test_claimed_once(redis_handler):
+    first: ReminderScheduler = make_scheduler(redis_handler, [])
+    second: ReminderScheduler = make_scheduler(redis_handler, [])
+
+    async def run():
+        now: float = time.time()
+        key: str = await schedule_tomorrow(first, now)
+        await first._poll(now)
+        await second._poll(now + 1)
+
+        assert [entry[1] for entry in first._heap] == [key]
+        assert second._heap == []
+
+    asyncio.run(run())
+
+
+def test_stale_claim_is_given_back(redis_handler):
+    first: ReminderScheduler = make_scheduler(redis_handler, [])
+    sent: list[str] = []
+    second: ReminderScheduler = make_scheduler(redis_handler, sent)
+
+    async def run():
+        now: float = time.time()
+        key: str = await schedule_tomorrow(first, now)
+        await first._poll(now)
+        fire_at: float = first._heap[0][0]
+        # the first replica died before sending, within the timeout the claim is still its own
+        await second._poll(now + 299)
+        assert second._heap == []
+
+        await second._poll(now + 301)
+        assert second._heap == [(fire_at, key)]
+        await second._fire([key])
+        assert sent == [key]
+
+    asyncio.run(run())
+
+
+def test_fired_is_not_given_back(redis_handler):
+    sent: list[str] = []
+    first: ReminderScheduler = make_scheduler(redis_handler, sent)
+    second: ReminderScheduler = make_scheduler(redis_handler, [])
+
+    async def run():
+        now: float = time.time()
+        key: str = await schedule_tomorrow(first, now)
+        await first._poll(now)
+        await first._fire([key])
+        await second._poll(now + 301)
+
+        assert sent == [key]
+        assert second._heap == []
+
+    asyncio.run(run())
+
+
+def test_cancelled_after_claim_is_not_sent(redis_handler):
+    sent: list[str] = []
+    first: ReminderScheduler = make_scheduler(redis_handler, sent)
+    second: ReminderScheduler = make_scheduler(redis_handler, [])
+
+    async def run():
+        now: float = time.time()
+        key: str = await schedule_tomorrow(first, now)
+        await first._poll(now)
+        # cancelled on another replica, the local heap of the first one still has it
+        await second.cancel(meeting_pk=5, tg_id=1001)
+        await first._fire([key])
+
+        assert sent == []
+        assert first.get_stats()["cancelled"] == 1
+
+    asyncio.run(run())
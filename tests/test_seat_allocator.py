@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiogram")
+
+from api.meetings.Meeting import Meeting
+from utils.SeatAllocator import SeatAllocator, SeatAlreadyHeld
+
+
+MEETING: dict = {
+    "pk": 5,
+    "name": "Book club",
+    "date_time": "2026-10-20T19:00:00+03:00",
+    "can_be_booked": True,
+    "place": {"pk": 2, "name": "Cafe", "address": "Main st. 1", "link": "", "description": ""},
+    "tickets": [{"pk": 21, "price": 500.0}, {"pk": 22, "price": 500.0}, {"pk": 23, "price": 500.0}],
+}
+
+
+def make_allocator(redis_handler) -> SeatAllocator:
+    async def load_meeting(pk: int) -> Meeting:
+        return Meeting(**MEETING)
+
+    async def load_meetings() -> list[Meeting]:
+        return [Meeting(**MEETING)]
+
+    return SeatAllocator(
+        redis_handler, load_meetings=load_meetings, load_meeting=load_meeting,
+        hold_ttl=120, state_ttl=3600, reconcile_interval=60,
+    )
+
+
+async def get_free(redis_handler, allocator: SeatAllocator) -> set[int]:
+    return set(map(int, await redis_handler.db_redis.smembers(allocator._get_keys(MEETING["pk"])[0])))
+
+
+def test_concurrent_allocation_gets_distinct_seats(redis_handler):
+    allocator: SeatAllocator = make_allocator(redis_handler)
+
+    async def run() -> list[int | None]:
+        return await asyncio.gather(*[allocator.allocate(MEETING["pk"], tg_id) for tg_id in range(1000, 1005)])
+
+    seats: list[int | None] = asyncio.run(run())
+
+    assert sorted(pk for pk in seats if pk) == [21, 22, 23]
+    assert seats.count(None) == 2
+    assert allocator.get_stats()["sold_out"] == 2
+
+
+def test_member_holds_one_seat(redis_handler):
+    allocator: SeatAllocator = make_allocator(redis_handler)
+
+    async def run():
+        await allocator.allocate(MEETING["pk"], 1000)
+        with pytest.raises(SeatAlreadyHeld):
+            await allocator.allocate(MEETING["pk"], 1000)
+        assert len(await get_free(redis_handler, allocator)) == 2
+
+    asyncio.run(run())
+
+
+def test_commit_survives_stale_reconcile(redis_handler):
+    allocator: SeatAllocator = make_allocator(redis_handler)
+
+    async def run():
+        # the backend was read before the booking went through, its answer still shows the seat free
+        read_at: int = await allocator._get_time()
+        pk: int = await allocator.allocate(MEETING["pk"], 1000)
+        await allocator.commit(MEETING["pk"], pk)
+        await allocator._run_reconcile(Meeting(**MEETING), read_at, only_if_missing=False)
+
+        assert pk not in await get_free(redis_handler, allocator)
+        with pytest.raises(SeatAlreadyHeld):
+            await allocator.allocate(MEETING["pk"], 1000)
+
+    asyncio.run(run())
+
+
+def test_reconcile_after_commit_trusts_backend(redis_handler):
+    allocator: SeatAllocator = make_allocator(redis_handler)
+
+    async def run():
+        pk: int = await allocator.allocate(MEETING["pk"], 1000)
+        await allocator.commit(MEETING["pk"], pk)
+        # read after the commit: a seat it still shows free was cancelled on the backend
+        read_at: int = await allocator._get_time() + 1
+        await allocator._run_reconcile(Meeting(**MEETING), read_at, only_if_missing=False)
+
+        assert await get_free(redis_handler, allocator) == {21, 22, 23}
+        assert await allocator.allocate(MEETING["pk"], 1000) is not None
+
+    asyncio.run(run())
+
+
+def test_release_after_rejected_booking(redis_handler):
+    allocator: SeatAllocator = make_allocator(redis_handler)
+
+    async def run():
+        pk: int = await allocator.allocate(MEETING["pk"], 1000)
+        # the backend answered 4xx, nothing was booked
+        await allocator.release(MEETING["pk"], pk, 1000)
+        await allocator.release(MEETING["pk"], pk, 1000)
+
+        assert allocator.get_stats()["released"] == 1
+        assert await get_free(redis_handler, allocator) == {21, 22, 23}
+        assert await allocator.allocate(MEETING["pk"], 1000) is not None
+
+    asyncio.run(run())
+
+
+def test_release_of_committed_seat_is_ignored(redis_handler):
+    allocator: SeatAllocator = make_allocator(redis_handler)
+
+    async def run():
+        pk: int = await allocator.allocate(MEETING["pk"], 1000)
+        await allocator.commit(MEETING["pk"], pk)
+        await allocator.release(MEETING["pk"], pk, 1000)
+
+        assert allocator.get_stats()["released"] == 0
+        assert pk not in await get_free(redis_handler, allocator)
+
+    asyncio.run(run())
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.base import Snapshot
+from api.base.Dates import CLUB_TZ
+from api.bookings.Booking import Booking
+from api.meetings.Meeting import Meeting
+from api.members.Member import Member
+from api.subscribes.Subscribe import Subscribe
+
+
+MEMBER: dict = {"pk": 7, "tg_id": 1001, "login": "@reader", "name": "Anna", "surname": "K", "bookings": [3, 4]}
+BOOKING: dict = {
+    "pk": 11, "date_time": "2026-10-18T12:30:00+00:00", "is_paid": False, "user_confirm_paid": True,
+    "member": MEMBER,
+}
+MEETING: dict = {
+    "pk": 5,
+    "name": "Book club",
+    "date_time": "2026-10-20T19:00:00+03:00",
+    "can_be_booked": True,
+    "place": {"pk": 2, "name": "Cafe", "address": "Main st. 1", "link": "", "description": ""},
+    "tickets": [
+        {"pk": 21, "price": 500.0, "booking": [BOOKING]},
+        {"pk": 22, "price": 500.0},
+    ],
+}
+SUBSCRIBE: dict = {
+    "pk": 9, "date_time": "2026-10-01T10:00:00+05:00", "price": 2000.0, "user_confirm_paid": True,
+    "is_paid": False, "is_active": True, "is_first": False, "cnt_meetings": 4, "member": MEMBER,
+}
+
+
+def assert_same_member(member: Member, expected: Member):
+    assert member.to_tuple() == expected.to_tuple()
+    assert member.get_full_name() == expected.get_full_name()
+
+
+def assert_same_meeting(meeting: Meeting, expected: Meeting):
+    assert meeting.to_tuple() == expected.to_tuple()
+    assert meeting.get_date_time() == expected.get_date_time()
+    assert meeting.get_date_time().utcoffset() == expected.get_date_time().utcoffset()
+    assert meeting.get_cnt_free_tickets() == expected.get_cnt_free_tickets()
+
+    booking: Booking = meeting.get_tickets()[0].get_booking()
+    expected_booking: Booking = expected.get_tickets()[0].get_booking()
+    assert booking.get_date_time() == expected_booking.get_date_time()
+    assert booking.get_date_time().tzinfo is not None
+    assert_same_member(booking.get_member(), expected_booking.get_member())
+    assert meeting.get_ticket_by_tg_id(MEMBER["tg_id"]).get_pk() == 21
+
+
+def test_meeting_with_unhydrated_tickets():
+    meeting: Meeting = Meeting(**MEETING)
+    loaded: Meeting = Snapshot.loads(Snapshot.dumps(meeting))
+
+    assert isinstance(loaded, Meeting)
+    assert_same_meeting(loaded, Meeting(**MEETING))
+
+
+def test_meeting_with_hydrated_tickets():
+    meeting: Meeting = Meeting(**MEETING)
+    meeting.get_free_tickets()
+    meeting.get_tickets()[0].get_booking().get_member()
+    loaded: Meeting = Snapshot.loads(Snapshot.dumps(meeting))
+
+    assert_same_meeting(loaded, meeting)
+
+
+def test_meeting_keeps_aware_datetime():
+    meeting: Meeting = Meeting(**{**MEETING, "date_time": "2026-10-20T16:00:00+00:00"})
+    loaded: Meeting = Snapshot.loads(Snapshot.dumps(meeting))
+
+    assert loaded.get_date_time() == datetime(2026, 10, 20, 16, tzinfo=timezone.utc)
+    assert loaded.get_date_time().tzinfo == CLUB_TZ
+
+
+def test_member():
+    member: Member = Member(**MEMBER)
+    loaded: Member = Snapshot.loads(Snapshot.dumps(member))
+
+    assert isinstance(loaded, Member)
+    assert_same_member(loaded, member)
+
+
+def test_subscribe():
+    subscribe: Subscribe = Subscribe(**SUBSCRIBE)
+    loaded: Subscribe = Snapshot.loads(Snapshot.dumps(subscribe))
+
+    assert isinstance(loaded, Subscribe)
+    assert loaded.to_tuple() == subscribe.to_tuple()
+    assert loaded.get_date_time() == datetime(2026, 10, 1, 10, tzinfo=timezone(timedelta(hours=5)))
+    assert loaded.get_date_time().tzinfo is not None
+
+
+def test_unknown_type():
+    with pytest.raises(Snapshot.SnapshotError):
+        Snapshot.dumps(Booking(**BOOKING))
+
+
+def test_bad_magic():
+    data: bytes = Snapshot.dumps(Member(**MEMBER))
+
+    with pytest.raises(Snapshot.SnapshotError, match="not a snapshot") as e:
+        Snapshot.loads(b"XX" + data[2:])
+    assert not isinstance(e.value, Snapshot.SnapshotVersionError)
+
+
+def test_wrong_version():
+    data: bytes = Snapshot.dumps(Member(**MEMBER))
+
+    with pytest.raises(Snapshot.SnapshotVersionError, match="schema"):
+        Snapshot.loads(data[:2] + bytes((Snapshot.SCHEMA_VERSION + 1,)) + data[3:])
+
+
+def test_truncated():
+    data: bytes = Snapshot.dumps(Member(**MEMBER))
+
+    with pytest.raises(Snapshot.SnapshotError):
+        Snapshot.loads(data[:3])
+    with pytest.raises(Snapshot.SnapshotError, match="broken"):
+        Snapshot.loads(data[:-3])
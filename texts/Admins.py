@@ -7,6 +7,10 @@ class Admins:
     def confirm_cancel(user_info: str, meeting_info: str):
         return f"{user_info} отменил бронирование на встречу {meeting_info}\n\nНадо вернуть ему деньги"
 
+    @staticmethod
+    def reminder(text: str):
+        return f"Напоминаю, никто так и не отреагировал:\n\n{text}"
+
     @staticmethod
     def booking_success():
         return "Бронь подтвердил, участника оповестил, что все оплачено и все ок"
@@ -23,6 +27,10 @@ class Admins:
     def cancel_already():
         return "Похоже, что пользователь отменил бронирование на встречу, ну и ладно"
 
+    @staticmethod
+    def in_progress():
+        return "Этим уже занимается кто-то из админов, подождите пару минут"
+
     @staticmethod
     def error():
         return "Что по пошло не так и поломалось я хз"
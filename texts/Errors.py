@@ -16,4 +16,8 @@ class Errors:
         return "Произошла какая-то ошибка при бронировании, не могу с ней разобраться сам, напишите моим разработчикам или попробуйте снова чуть позже"
     @staticmethod
     def try_one_more_time():
-        return "Попробуйте записаться еще раз"
\ No newline at end of file
+        return "Попробуйте записаться еще раз"
+
+    @staticmethod
+    def backend_unavailable():
+        return "У нас что то временно не работает, попробуйте, пожалуйста, через пару минут"
@@ -87,4 +87,14 @@ class Messages:
     def cancel_with_return_no_money():
         return "Бронирование отменено, деньги не вернем потому что вы отменили встречу в день встречи, посмотрите встречи на другую дату"
 
+    @staticmethod
+    def reminder_tomorrow(meeting_name: str, datetime_str: str):
+        return f"Напоминаю, завтра встреча {meeting_name}\nДата и время: {datetime_str}"
+
+    @staticmethod
+    def reminder_soon(meeting_name: str, datetime_str: str):
+        return f"Напоминаю, через пару часов встреча {meeting_name}\nДата и время: {datetime_str}"
 
+    @staticmethod
+    def still_processing():
+        return "Секунду, я еще обрабатываю ваш запрос, попробуйте чуть позже"
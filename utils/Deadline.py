@@ -0,0 +1,78 @@
+import asyncio
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Awaitable
+
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+_detached: set[asyncio.Task] = set()
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def set_deadline(seconds: float) -> Token:
+    return _deadline.set(time.monotonic() + seconds)
+
+
+def clear_deadline() -> Token:
+    return _deadline.set(None)
+
+
+def reset_deadline(token: Token):
+    _deadline.reset(token)
+
+
+def get_remaining() -> float | None:
+    deadline: float | None = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline():
+    remaining: float | None = get_remaining()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded()
+
+
+async def within_deadline(aw: Awaitable) -> Any:
+    remaining: float | None = get_remaining()
+    if remaining is None:
+        return await aw
+
+    if remaining <= 0:
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        raise DeadlineExceeded()
+
+    try:
+        return await asyncio.wait_for(aw, remaining)
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded() from e
+
+
+async def finish_detached(aw: Awaitable) -> Any:
+    # work that changes state is not cut in the middle: it goes on without a deadline,
+    # the caller only stops waiting for it when its own budget runs out
+    check_deadline()
+    task: asyncio.Task = asyncio.ensure_future(_run_detached(aw))
+    _detached.add(task)
+    task.add_done_callback(_detached_done)
+    return await within_deadline(asyncio.shield(task))
+
+
+async def wait_detached():
+    if _detached:
+        await asyncio.gather(*_detached, return_exceptions=True)
+
+
+async def _run_detached(aw: Awaitable) -> Any:
+    clear_deadline()
+    return await aw
+
+
+def _detached_done(task: asyncio.Task):
+    _detached.discard(task)
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,98 @@
+import asyncio
+from typing import Callable
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from utils.Deadline import clear_deadline
+from utils.RedisHandler import RedisHandler
+
+
+class InvalidationBus:
+    def __init__(
+            self, redis: RedisHandler, host: str, port: int, channel: str, on_message: Callable[[str], None],
+            on_reset: Callable[[], None], reconnect_delay: float = 5.0,
+    ):
+        self._redis: RedisHandler = redis
+        self._host: str = host
+        self._port: int = port
+        self._channel: str = channel
+        self._on_message: Callable[[str], None] = on_message
+        # called when messages may have been missed, everything local has to go
+        self._on_reset: Callable[[], None] = on_reset
+        self._reconnect_delay: float = reconnect_delay
+        self._publishing: set[asyncio.Task] = set()
+        self._task: asyncio.Task | None = None
+        self._stats: dict[str, int] = {
+            "published": 0,
+            "received": 0,
+            "publish_errors": 0,
+            "reconnects": 0,
+        }
+
+    def publish(self, message: str):
+        # invalidations happen in sync code, the message goes out on its own
+        if self._task is None:
+            return
+        task: asyncio.Task = asyncio.ensure_future(self._publish(message))
+        self._publishing.add(task)
+        task.add_done_callback(self._publishing.discard)
+
+    def get_stats(self) -> dict[str, int]:
+        return dict(self._stats)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._publishing:
+            await asyncio.gather(*self._publishing, return_exceptions=True)
+
+    async def _publish(self, message: str):
+        clear_deadline()
+        try:
+            await self._redis.db_redis.publish(self._channel, message)
+        except (RedisError, OSError):
+            self._stats["publish_errors"] += 1
+        else:
+            self._stats["published"] += 1
+
+    async def _run(self):
+        clear_deadline()
+        while True:
+            try:
+                await self._listen()
+            except (RedisError, OSError):
+                pass
+
+            # whatever was published while disconnected is lost
+            self._on_reset()
+            self._stats["reconnects"] += 1
+            await asyncio.sleep(self._reconnect_delay)
+
+    async def _listen(self):
+        # own connection without a socket timeout, a quiet channel is not a dead one
+        listener: aioredis.Connection = aioredis.Connection(host=self._host, port=self._port, decode_responses=True)
+        try:
+            await listener.connect()
+            await listener.send_command("SUBSCRIBE", self._channel)
+            await listener.read_response()
+            self._on_reset()
+            while True:
+                message: list = await listener.read_response()
+                if not message or message[0] != "message":
+                    continue
+                self._stats["received"] += 1
+                self._on_message(message[2])
+        finally:
+            await listener.disconnect()
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import CallbackQuery, TelegramObject
+
+from utils.Deadline import set_deadline, reset_deadline, within_deadline
+
+
+class DeadlineMiddleware(BaseMiddleware):
+    def __init__(self, seconds: float):
+        self.seconds: float = seconds
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any],
+    ) -> Any:
+        token = set_deadline(self.seconds)
+        try:
+            return await handler(event, data)
+        finally:
+            reset_deadline(token)
+
+
+class DeadlineRequestMiddleware(BaseRequestMiddleware):
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+    ) -> Any:
+        return await within_deadline(make_request(bot, method))
+
+
+class CallbackAnswer:
+    def __init__(self, callback: CallbackQuery, on_answer: Callable[[float, bool], None]):
+        self.callback: CallbackQuery = callback
+        self.is_answered: bool = False
+        self._on_answer: Callable[[float, bool], None] = on_answer
+        self._started_at: float = time.monotonic()
+
+    async def answer(self, text: str | None = None, show_alert: bool = False, is_early: bool = False) -> bool:
+        # the flag is set before the request, so a racing answer never goes out twice
+        if self.is_answered:
+            return False
+
+        self.is_answered = True
+        self._on_answer(time.monotonic() - self._started_at, is_early)
+        await self.callback.answer(text=text, show_alert=show_alert)
+        return True
+
+
+_callback_answer: ContextVar[CallbackAnswer | None] = ContextVar("callback_answer", default=None)
+
+
+async def answer_callback(callback: CallbackQuery, text: str | None = None, show_alert: bool = False) -> bool:
+    holder: CallbackAnswer | None = _callback_answer.get()
+    if holder is None or holder.callback.id != callback.id:
+        await callback.answer(text=text, show_alert=show_alert)
+        return True
+    return await holder.answer(text=text, show_alert=show_alert)
+
+
+class CallbackAnswerMiddleware(BaseMiddleware):
+    def __init__(self, grace: float):
+        self.grace: float = grace
+        self._stats: dict[str, float] = {
+            "callbacks": 0,
+            "answered": 0,
+            "early": 0,
+            "ack_time_total": 0.0,
+            "ack_time_max": 0.0,
+        }
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: CallbackQuery,
+            data: dict[str, Any],
+    ) -> Any:
+        self._stats["callbacks"] += 1
+        holder: CallbackAnswer = CallbackAnswer(callback=event, on_answer=self._record)
+        token = _callback_answer.set(holder)
+        # clears the spinner if the handler has not answered within the grace period
+        timer: asyncio.Task = asyncio.create_task(self._answer_later(holder))
+        try:
+            result: Any = await handler(event, data)
+        finally:
+            # an early answer already on its way is left to finish
+            if not holder.is_answered:
+                timer.cancel()
+
+        # on errors the holder stays set, the error handlers run after this middleware
+        _callback_answer.reset(token)
+        await holder.answer()
+        return result
+
+    def get_stats(self) -> dict[str, float]:
+        answered: float = self._stats["answered"] or 1
+        return {**self._stats, "ack_time_avg": self._stats["ack_time_total"] / answered}
+
+    async def _answer_later(self, holder: CallbackAnswer):
+        await asyncio.sleep(self.grace)
+        try:
+            await holder.answer(is_early=True)
+        except Exception:
+            pass
+
+    def _record(self, ack_time: float, is_early: bool):
+        self._stats["answered"] += 1
+        self._stats["early"] += is_early
+        self._stats["ack_time_total"] += ack_time
+        self._stats["ack_time_max"] = max(self._stats["ack_time_max"], ack_time)
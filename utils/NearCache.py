@@ -0,0 +1,167 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError, ResponseError
+
+from utils.Deadline import clear_deadline
+
+
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+MISSING = object()
+
+
+class NearCache:
+    def __init__(
+            self, host: str, port: int, prefixes: list[str], maxsize: int,
+            fallback_ttl: float, reconnect_delay: float = 5.0, health_interval: float = 10.0,
+    ):
+        self._host: str = host
+        self._port: int = port
+        self._prefixes: tuple[str, ...] = tuple(prefixes)
+        self._maxsize: int = maxsize
+        self._fallback_ttl: float = fallback_ttl
+        self._reconnect_delay: float = reconnect_delay
+        self._health_interval: float = health_interval
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        # bumped on every invalidation, reads started before it are not stored
+        self._epoch: int = 0
+        self._is_tracking: bool = False
+        self._task: asyncio.Task | None = None
+        self._stats: dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "reconnects": 0,
+        }
+
+    def matches(self, key: str) -> bool:
+        return key.startswith(self._prefixes)
+
+    def is_tracking(self) -> bool:
+        return self._is_tracking
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry: tuple[Any, float] | None = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            # while the server tracks the prefixes, an entry lives until it is invalidated
+            if self._is_tracking or time.monotonic() - stored_at < self._fallback_ttl:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return None if value is MISSING else value
+
+        self._stats["misses"] += 1
+        epoch: int = self._epoch
+        value: Any = await loader()
+        if epoch == self._epoch:
+            self._entries[key] = (MISSING if value is None else value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: str):
+        self._epoch += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._epoch += 1
+        self._entries.clear()
+
+    def get_stats(self) -> dict[str, Any]:
+        return {**self._stats, "size": len(self._entries), "is_tracking": self._is_tracking}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._is_tracking = False
+
+    async def _run(self):
+        clear_deadline()
+        while True:
+            try:
+                await self._track()
+            except ResponseError:
+                # server without tracking support (< 6.0), stay in the ttl mode
+                self._is_tracking = False
+                self.clear()
+                return
+            except (RedisError, OSError):
+                pass
+
+            # nothing guarantees the entries are fresh without tracking, fall back to the ttl
+            self._is_tracking = False
+            self.clear()
+            self._stats["reconnects"] += 1
+            await asyncio.sleep(self._reconnect_delay)
+
+    async def _track(self):
+        listener: aioredis.Connection = aioredis.Connection(host=self._host, port=self._port, decode_responses=True)
+        tracker: aioredis.Connection = aioredis.Connection(host=self._host, port=self._port, decode_responses=True)
+        try:
+            await listener.connect()
+            await listener.send_command("CLIENT", "ID")
+            listener_id: int = await listener.read_response()
+            await listener.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+            await listener.read_response()
+
+            # broadcast mode: the server reports every change under the prefixes, whoever reads them
+            await tracker.connect()
+            prefix_args: list[str] = []
+            for prefix in self._prefixes:
+                prefix_args += ["PREFIX", prefix]
+            await tracker.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", listener_id, "BCAST", *prefix_args)
+            await tracker.read_response()
+
+            self.clear()
+            self._is_tracking = True
+            tasks: list[asyncio.Task] = [
+                asyncio.create_task(self._listen(listener)),
+                asyncio.create_task(self._keep_alive(tracker)),
+            ]
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await listener.disconnect()
+            await tracker.disconnect()
+
+    async def _listen(self, listener: aioredis.Connection):
+        while True:
+            message: list = await listener.read_response()
+            if not message or message[0] != "message":
+                continue
+
+            self._stats["invalidations"] += 1
+            # no keys means the whole db was flushed
+            if message[2] is None:
+                self.clear()
+            else:
+                for key in message[2]:
+                    self.invalidate(key)
+
+    async def _keep_alive(self, tracker: aioredis.Connection):
+        # tracking dies silently with the tracker connection, so it is checked explicitly
+        while True:
+            await asyncio.sleep(self._health_interval)
+            await tracker.send_command("PING")
+            await tracker.read_response()
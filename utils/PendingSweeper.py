@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable
+
+from utils.Deadline import clear_deadline
+from utils.RedisHandler import RedisHandler
+
+
+# what on_stale did with a stale pending state
+NOTIFIED = "notified"
+# nothing to notify with, e.g. written before the value had all the fields
+SKIPPED = "skipped"
+# not needed anymore, the key is dropped
+DROP = "drop"
+
+T_ON_STALE = Callable[[str, dict], Awaitable[str]]
+
+
+class PendingSweeper:
+    def __init__(
+            self, redis: RedisHandler, patterns: list[str], on_stale: T_ON_STALE,
+            interval: float, stale_after: float, ttl: int, claim_timeout: float = 0.0, batch_size: int = 100,
+    ):
+        self._redis: RedisHandler = redis
+        self._patterns: list[str] = patterns
+        self._on_stale: T_ON_STALE = on_stale
+        self._interval: float = interval
+        self._stale_after: float = stale_after
+        self._ttl: int = ttl
+        # a value marked with processing_at is being handled by someone else
+        self._claim_timeout: float = claim_timeout
+        self._batch_size: int = batch_size
+        self._task: asyncio.Task | None = None
+        self._stats: dict[str, Any] = {
+            "runs": 0,
+            "last_run_at": None,
+            "last_run_duration": 0.0,
+            "scanned": 0,
+            "stale": 0,
+            "renotified": 0,
+            "skipped": 0,
+            "expired": 0,
+            "errors": 0,
+            "pending": {pattern: 0 for pattern in patterns},
+            "keyspace": 0,
+        }
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self) -> dict[str, Any]:
+        return {**self._stats, "pending": dict(self._stats["pending"])}
+
+    async def sweep(self):
+        started_at: float = time.monotonic()
+        for pattern in self._patterns:
+            pending: int = 0
+            async for key in self._redis.scan_iter(match=pattern, count=self._batch_size):
+                pending += 1
+                self._stats["scanned"] += 1
+                try:
+                    await self._check_key(key)
+                except Exception:
+                    self._stats["errors"] += 1
+            self._stats["pending"][pattern] = pending
+
+        self._stats["keyspace"] = await self._redis.get_dbsize()
+        self._stats["runs"] += 1
+        self._stats["last_run_at"] = time.time()
+        self._stats["last_run_duration"] = time.monotonic() - started_at
+
+    async def _run(self):
+        clear_deadline()
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                self._stats["errors"] += 1
+            await asyncio.sleep(self._interval)
+
+    async def _check_key(self, key: str):
+        value: str | None = await self._redis.get(key)
+        if value is None:
+            return
+
+        try:
+            info: dict = json.loads(value)
+        except ValueError:
+            if await self._redis.delete_if_equal(key, value):
+                self._stats["expired"] += 1
+            return
+
+        now: float = time.time()
+        if "created_at" not in info:
+            # written before pending keys had a ttl, start counting from now
+            info["created_at"] = now
+            await self._redis.replace_if_equal(key, value, json.dumps(info), ex=self._ttl)
+            return
+
+        if now - info.get("notified_at", info["created_at"]) < self._stale_after:
+            return
+        if now - info.get("processing_at", 0) < self._claim_timeout:
+            return
+
+        # every replica sweeps, only the one that moved notified_at gets to notify
+        info["notified_at"] = now
+        claimed: str = json.dumps(info)
+        if not await self._redis.replace_if_equal(key, value, claimed):
+            return
+
+        self._stats["stale"] += 1
+        try:
+            result: str = await self._on_stale(key, info)
+        except Exception:
+            # given back, so the next sweep tries again
+            await self._redis.replace_if_equal(key, claimed, value)
+            raise
+
+        if result == NOTIFIED:
+            self._stats["renotified"] += 1
+        elif result == SKIPPED:
+            self._stats["skipped"] += 1
+        elif await self._redis.delete_if_equal(key, claimed):
+            self._stats["expired"] += 1
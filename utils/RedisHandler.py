@@ -1,6 +1,12 @@
-from typing import Any
+import functools
+import json
+from typing import Any, AsyncIterator
 
-import redis
+from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+from redis import asyncio as aioredis
+
+from utils.Deadline import within_deadline
+from utils.NearCache import NearCache
 
 HOST = str
 PORT = int
@@ -8,14 +14,59 @@ PORT = int
 DELETE = "delete"
 CONFIRM = "confirm"
 
+# KEYS[1] - pending confirmation, KEYS[2] - pending refund
+SWITCH_TO_REFUND_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+# changes the key only if nobody touched it since it was read, empty ARGV[2] deletes it
+COMPARE_AND_SET_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if ARGV[2] == '' then
+    redis.call('DEL', KEYS[1])
+elseif ARGV[3] == '' then
+    redis.call('SET', KEYS[1], ARGV[2], 'KEEPTTL')
+else
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+return 1
+"""
+
 
 class RedisHandler:
-    def __init__(self, host: HOST, port: PORT):
-        self.db_redis: redis.Redis = redis.Redis(
+    def __init__(self, host: HOST, port: PORT, socket_timeout: float = 2.0, max_connections: int = 50):
+        # redis-py picks the hiredis parser for pooled connections when hiredis is installed
+        self.pool: aioredis.ConnectionPool = aioredis.ConnectionPool(
+            host=host,
+            port=port,
+            decode_responses=True,
+            socket_timeout=socket_timeout,
+            max_connections=max_connections,
+        )
+        # binary snapshots must not be decoded
+        self.pool_bytes: aioredis.ConnectionPool = aioredis.ConnectionPool(
             host=host,
             port=port,
-            decode_responses=True
+            socket_timeout=socket_timeout,
+            max_connections=max_connections,
         )
+        self.db_redis: aioredis.Redis = aioredis.Redis(connection_pool=self.pool)
+        self.db_redis_bytes: aioredis.Redis = aioredis.Redis(connection_pool=self.pool_bytes)
+
+        self._switch_to_refund = self.db_redis.register_script(SWITCH_TO_REFUND_SCRIPT)
+        self._compare_and_set = self.db_redis.register_script(COMPARE_AND_SET_SCRIPT)
+
+        self.near_cache: NearCache | None = None
+
+    def set_near_cache(self, near_cache: NearCache):
+        self.near_cache = near_cache
 
     @staticmethod
     def generate_key(key_parts: [] = None):
@@ -25,8 +76,22 @@ class RedisHandler:
         key_parts_str = list(map(lambda x: str(x), key_parts))
         return "_".join(key_parts_str)
 
-    def get(self, key: str) -> Any:
-        return self.db_redis.get(key)
+    async def get(self, key: str) -> Any:
+        if self.near_cache is not None and self.near_cache.matches(key):
+            return await self.near_cache.get_or_load(key, lambda: within_deadline(self.db_redis.get(key)))
+        return await within_deadline(self.db_redis.get(key))
+
+    async def mget(self, keys: list[str]) -> list[Any]:
+        return await within_deadline(self.db_redis.mget(keys))
+
+    async def get_bytes(self, key: str) -> bytes | None:
+        return await within_deadline(self.db_redis_bytes.get(key))
+
+    async def mget_bytes(self, keys: list[str]) -> list[bytes | None]:
+        return await within_deadline(self.db_redis_bytes.mget(keys))
+
+    async def set_bytes(self, key: str, value: bytes, ex: int | None = None):
+        await within_deadline(self.db_redis_bytes.set(key, value, ex=ex))
 
     def get_key_confirm(self, name: str, pk: int):
         return self.generate_key([
@@ -42,8 +107,76 @@ class RedisHandler:
             str(pk)
         ])
 
-    def delete(self, key: str):
-        self.db_redis.delete(key)
+    def get_prefix_confirm(self, name: str):
+        return self.generate_key([CONFIRM, name, ""])
+
+    def get_prefix_delete(self, name: str):
+        return self.generate_key([DELETE, name, ""])
+
+    def get_pattern_confirm(self, name: str):
+        return f"{self.get_prefix_confirm(name)}*"
+
+    def get_pattern_delete(self, name: str):
+        return f"{self.get_prefix_delete(name)}*"
+
+    @staticmethod
+    def is_key_confirm(key: str) -> bool:
+        return key.startswith(f"{CONFIRM}_")
+
+    @staticmethod
+    def get_pk_from_key(key: str) -> int | None:
+        pk: str = key.rsplit("_", 1)[-1]
+        return int(pk) if pk.isdigit() else None
+
+    async def delete(self, key: str):
+        self._forget(key)
+        await within_deadline(self.db_redis.delete(key))
+
+    async def set(self, key: str, value: Any = None, ex: int | None = None):
+        self._forget(key)
+        await within_deadline(self.db_redis.set(key, value, ex=ex))
+
+    async def claim(self, key: str, value: str, ex: int | None = None) -> bool:
+        self._forget(key)
+        return bool(await within_deadline(self.db_redis.set(key, value, ex=ex, nx=True)))
+
+    async def switch_to_refund(self, confirm_key: str, delete_key: str, value: str, ex: int) -> bool:
+        self._forget(confirm_key, delete_key)
+        return bool(await within_deadline(self._switch_to_refund(keys=[confirm_key, delete_key], args=[value, ex])))
+
+    async def replace_if_equal(self, key: str, old_value: str, new_value: str, ex: int | None = None) -> bool:
+        self._forget(key)
+        return bool(await within_deadline(self._compare_and_set(keys=[key], args=[old_value, new_value, ex or ""])))
+
+    async def delete_if_equal(self, key: str, value: str) -> bool:
+        self._forget(key)
+        return bool(await within_deadline(self._compare_and_set(keys=[key], args=[value, "", ""])))
+
+    async def scan_iter(self, match: str, count: int = 100) -> AsyncIterator[str]:
+        async for key in self.db_redis.scan_iter(match=match, count=count):
+            yield key
+
+    async def get_dbsize(self) -> int:
+        return await within_deadline(self.db_redis.dbsize())
+
+    def get_fsm_storage(self, state_ttl: int | None = None, data_ttl: int | None = None) -> RedisStorage:
+        return RedisStorage(
+            redis=self.db_redis,
+            # several bots may share one redis
+            key_builder=DefaultKeyBuilder(with_bot_id=True),
+            state_ttl=state_ttl,
+            data_ttl=data_ttl,
+            json_dumps=functools.partial(json.dumps, ensure_ascii=False, separators=(",", ":")),
+        )
+
+    def _forget(self, *keys: str):
+        # own writes are dropped locally right away, not only when the server reports them
+        if self.near_cache is not None:
+            for key in keys:
+                self.near_cache.invalidate(key)
 
-    def set(self, key: str, value: Any = None):
-        self.db_redis.set(key, value)
+    async def close(self):
+        await self.db_redis.close()
+        await self.db_redis_bytes.close()
+        await self.pool.disconnect()
+        await self.pool_bytes.disconnect()
@@ -0,0 +1,189 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from utils.Deadline import clear_deadline, within_deadline
+from utils.RedisHandler import RedisHandler
+
+
+TOMORROW = "tomorrow"
+SOON = "soon"
+
+REMINDERS: dict[str, timedelta] = {
+    TOMORROW: timedelta(days=1),
+    SOON: timedelta(hours=2),
+}
+
+# KEYS: due, claimed, fire times of the claimed; ARGV: horizon, limit, claims older than this are given back, now
+# the claimed set is scored by the claim time, so a reminder is given back only if its replica died before it was sent
+CLAIM_SCRIPT = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[3])
+for _, member in ipairs(stale) do
+    local fire_at = redis.call('HGET', KEYS[3], member)
+    if fire_at then
+        redis.call('ZADD', KEYS[1], fire_at, member)
+    end
+    redis.call('ZREM', KEYS[2], member)
+    redis.call('HDEL', KEYS[3], member)
+end
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #due, 2 do
+    redis.call('ZADD', KEYS[2], ARGV[4], due[i])
+    redis.call('HSET', KEYS[3], due[i], due[i + 1])
+    redis.call('ZREM', KEYS[1], due[i])
+end
+return due
+"""
+
+
+class Reminder:
+    __slots__ = ("meeting_pk", "tg_id", "kind")
+
+    def __init__(self, meeting_pk: int, tg_id: int, kind: str):
+        self.meeting_pk: int = meeting_pk
+        self.tg_id: int = tg_id
+        self.kind: str = kind
+
+    def to_key(self) -> str:
+        return f"{self.meeting_pk}:{self.tg_id}:{self.kind}"
+
+    @classmethod
+    def from_key(cls, key: str) -> "Reminder":
+        meeting_pk, tg_id, kind = key.split(":")
+        return cls(meeting_pk=int(meeting_pk), tg_id=int(tg_id), kind=kind)
+
+
+class ReminderScheduler:
+    def __init__(
+            self, redis: RedisHandler, on_due: Callable[[list[Reminder]], Awaitable[None]],
+            poll_interval: float = 30.0, lookahead: float = 60.0, claim_timeout: float = 300.0,
+            batch_size: int = 500,
+    ):
+        self._redis: RedisHandler = redis
+        self._on_due: Callable[[list[Reminder]], Awaitable[None]] = on_due
+        self._poll_interval: float = poll_interval
+        # reminders due within it are taken from redis and wait in the local heap
+        self._lookahead: float = lookahead
+        self._claim_timeout: float = claim_timeout
+        self._batch_size: int = batch_size
+        self._claim = redis.db_redis.register_script(CLAIM_SCRIPT)
+        self._due_key: str = redis.generate_key(["reminders", "due"])
+        self._claimed_key: str = redis.generate_key(["reminders", "claimed"])
+        self._fire_key: str = redis.generate_key(["reminders", "fire"])
+        self._heap: list[tuple[float, str]] = []
+        self._task: asyncio.Task | None = None
+        self._stats: dict[str, int] = {
+            "scheduled": 0,
+            "claimed": 0,
+            "fired": 0,
+            "cancelled": 0,
+            "errors": 0,
+        }
+
+    async def schedule(self, meeting_pk: int, date_time: datetime, tg_id: int):
+        now: float = time.time()
+        mapping: dict[str, float] = {}
+        for kind, before in REMINDERS.items():
+            fire_at: float = (date_time - before).timestamp()
+            if fire_at > now:
+                mapping[Reminder(meeting_pk=meeting_pk, tg_id=tg_id, kind=kind).to_key()] = fire_at
+
+        if mapping:
+            await within_deadline(self._redis.db_redis.zadd(self._due_key, mapping))
+            self._stats["scheduled"] += len(mapping)
+
+    async def cancel(self, meeting_pk: int, tg_id: int):
+        keys: list[str] = [
+            Reminder(meeting_pk=meeting_pk, tg_id=tg_id, kind=kind).to_key()
+            for kind in REMINDERS
+        ]
+        async with self._redis.db_redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self._due_key, *keys)
+            pipe.zrem(self._claimed_key, *keys)
+            pipe.hdel(self._fire_key, *keys)
+            await within_deadline(pipe.execute())
+
+        # other replicas find out before firing, a cancelled reminder is not claimed anymore
+        heap: list[tuple[float, str]] = [entry for entry in self._heap if entry[1] not in keys]
+        if len(heap) != len(self._heap):
+            heapq.heapify(heap)
+            self._heap = heap
+
+    def get_stats(self) -> dict[str, int]:
+        return {**self._stats, "local": len(self._heap)}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # not sent ones go back to the due set after the claim timeout
+        self._heap.clear()
+
+    async def _run(self):
+        clear_deadline()
+        next_poll_at: float = 0.0
+        while True:
+            now: float = time.time()
+            if now >= next_poll_at:
+                try:
+                    await self._poll(now)
+                except Exception:
+                    self._stats["errors"] += 1
+                next_poll_at = now + self._poll_interval
+
+            due: list[str] = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[1])
+            if due:
+                await self._fire(due)
+                continue
+
+            wake_at: float = min(self._heap[0][0], next_poll_at) if self._heap else next_poll_at
+            await asyncio.sleep(max(0.0, wake_at - time.time()))
+
+    async def _poll(self, now: float):
+        while True:
+            # member, score, member, score...
+            claimed: list[str] = await self._claim(
+                keys=[self._due_key, self._claimed_key, self._fire_key],
+                args=[now + self._lookahead, self._batch_size, now - self._claim_timeout, now],
+            )
+            for i in range(0, len(claimed), 2):
+                heapq.heappush(self._heap, (float(claimed[i + 1]), claimed[i]))
+            self._stats["claimed"] += len(claimed) // 2
+            if len(claimed) // 2 < self._batch_size:
+                return
+
+    async def _fire(self, keys: list[str]):
+        for i in range(0, len(keys), self._batch_size):
+            batch: list[str] = keys[i:i + self._batch_size]
+            try:
+                # cancelled since they were claimed
+                scores: list[float | None] = await self._redis.db_redis.zmscore(self._claimed_key, batch)
+                batch = [key for key, score in zip(batch, scores) if score is not None]
+                self._stats["cancelled"] += len(scores) - len(batch)
+                if not batch:
+                    continue
+
+                await self._on_due([Reminder.from_key(key) for key in batch])
+                async with self._redis.db_redis.pipeline(transaction=True) as pipe:
+                    pipe.zrem(self._claimed_key, *batch)
+                    pipe.hdel(self._fire_key, *batch)
+                    await pipe.execute()
+            except Exception:
+                # left claimed, they are given back to the due set after the claim timeout
+                self._stats["errors"] += 1
+            else:
+                self._stats["fired"] += len(batch)
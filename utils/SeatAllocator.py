@@ -0,0 +1,226 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from api.meetings.Meeting import Meeting
+from utils.Deadline import clear_deadline, within_deadline
+from utils.RedisHandler import RedisHandler
+
+
+SEATS = "seats"
+
+# KEYS: free seats, held seats, seeded marker, seats of the members; ARGV: member, state ttl
+# -1 means the meeting was not seeded yet, -2 that the member already holds or took a seat
+ALLOCATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    return -1
+end
+if redis.call('HEXISTS', KEYS[4], ARGV[1]) == 1 then
+    return -2
+end
+local pk = redis.call('SPOP', KEYS[1])
+if not pk then
+    return 0
+end
+redis.call('HSET', KEYS[2], pk, redis.call('TIME')[1])
+redis.call('HSET', KEYS[4], ARGV[1], pk)
+redis.call('EXPIRE', KEYS[4], ARGV[2])
+return tonumber(pk)
+"""
+
+# KEYS: free seats, held seats, seats of the members; ARGV: seat, member
+RELEASE_SCRIPT = """
+if redis.call('HGET', KEYS[3], ARGV[2]) == ARGV[1] then
+    redis.call('HDEL', KEYS[3], ARGV[2])
+end
+if redis.call('HDEL', KEYS[2], ARGV[1]) == 1 then
+    redis.call('SADD', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# KEYS: seeded marker, taken seats, seats of the members; ARGV[1] - member
+# the booking is gone, the member may book again and the seat comes back with the next seeding
+CANCEL_SCRIPT = """
+local pk = redis.call('HGET', KEYS[3], ARGV[1])
+if pk then
+    redis.call('HDEL', KEYS[2], pk)
+    redis.call('HDEL', KEYS[3], ARGV[1])
+end
+redis.call('DEL', KEYS[1])
+"""
+
+# KEYS: held seats, taken seats; ARGV: seat, state ttl
+# the seat is remembered as taken, a backend answer read before the booking may still show it free
+COMMIT_SCRIPT = """
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], redis.call('TIME')[1])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+"""
+
+# KEYS: free seats, held seats, seeded marker, taken seats, seats of the members
+# ARGV: hold ttl, state ttl, only if not seeded, when the backend was read, free seats from the backend...
+RECONCILE_SCRIPT = """
+if ARGV[3] == '1' and redis.call('EXISTS', KEYS[3]) == 1 then
+    return 0
+end
+local now = tonumber(redis.call('TIME')[1])
+local held = redis.call('HGETALL', KEYS[2])
+for i = 1, #held, 2 do
+    if now - tonumber(held[i + 1]) > tonumber(ARGV[1]) then
+        redis.call('HDEL', KEYS[2], held[i])
+    end
+end
+-- a seat taken before the backend was read is in its answer already
+local taken = redis.call('HGETALL', KEYS[4])
+for i = 1, #taken, 2 do
+    if tonumber(taken[i + 1]) < tonumber(ARGV[4]) then
+        redis.call('HDEL', KEYS[4], taken[i])
+    end
+end
+-- a member keeps the seat only while it is held or not yet seen by the backend
+local members = redis.call('HGETALL', KEYS[5])
+for i = 1, #members, 2 do
+    if redis.call('HEXISTS', KEYS[2], members[i + 1]) == 0 and redis.call('HEXISTS', KEYS[4], members[i + 1]) == 0 then
+        redis.call('HDEL', KEYS[5], members[i])
+    end
+end
+redis.call('DEL', KEYS[1])
+for i = 5, #ARGV do
+    if redis.call('HEXISTS', KEYS[2], ARGV[i]) == 0 and redis.call('HEXISTS', KEYS[4], ARGV[i]) == 0 then
+        redis.call('SADD', KEYS[1], ARGV[i])
+    end
+end
+redis.call('SET', KEYS[3], '1', 'EX', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[4], ARGV[2])
+redis.call('EXPIRE', KEYS[5], ARGV[2])
+return 1
+"""
+
+
+class SeatAlreadyHeld(Exception):
+    pass
+
+
+class SeatAllocator:
+    def __init__(
+            self, redis: RedisHandler, load_meetings: Callable[[], Awaitable[list[Meeting]]],
+            load_meeting: Callable[[int], Awaitable[Meeting | None]],
+            hold_ttl: int, state_ttl: int, reconcile_interval: float,
+    ):
+        self._redis: RedisHandler = redis
+        # both must read the backend directly, a cached meeting may miss seats booked since
+        self._load_meetings: Callable[[], Awaitable[list[Meeting]]] = load_meetings
+        self._load_meeting: Callable[[int], Awaitable[Meeting | None]] = load_meeting
+        self._hold_ttl: int = hold_ttl
+        self._state_ttl: int = state_ttl
+        self._reconcile_interval: float = reconcile_interval
+        self._allocate = redis.db_redis.register_script(ALLOCATE_SCRIPT)
+        self._release = redis.db_redis.register_script(RELEASE_SCRIPT)
+        self._commit = redis.db_redis.register_script(COMMIT_SCRIPT)
+        self._cancel = redis.db_redis.register_script(CANCEL_SCRIPT)
+        self._reconcile = redis.db_redis.register_script(RECONCILE_SCRIPT)
+        self._task: asyncio.Task | None = None
+        self._stats: dict[str, int] = {
+            "allocated": 0,
+            "sold_out": 0,
+            "already_held": 0,
+            "released": 0,
+            "reconciled": 0,
+            "errors": 0,
+        }
+
+    async def allocate(self, meeting_pk: int, tg_id: int) -> int | None:
+        # one seat per member, a second tap must not book a second ticket
+        keys: list[str] = self._get_keys(meeting_pk)
+        allocate_keys: list[str] = [keys[0], keys[1], keys[2], keys[4]]
+        args: list = [tg_id, self._state_ttl]
+        pk: int = await within_deadline(self._allocate(keys=allocate_keys, args=args))
+        if pk == -1:
+            await self._seed(meeting_pk)
+            pk = await within_deadline(self._allocate(keys=allocate_keys, args=args))
+
+        if pk == -2:
+            self._stats["already_held"] += 1
+            raise SeatAlreadyHeld()
+        if pk > 0:
+            self._stats["allocated"] += 1
+            return pk
+
+        self._stats["sold_out"] += 1
+        return None
+
+    async def release(self, meeting_pk: int, ticket_pk: int, tg_id: int):
+        # only for a seat the backend surely did not book
+        keys: list[str] = self._get_keys(meeting_pk)
+        if await within_deadline(self._release(keys=[keys[0], keys[1], keys[4]], args=[ticket_pk, tg_id])):
+            self._stats["released"] += 1
+
+    async def commit(self, meeting_pk: int, ticket_pk: int):
+        keys: list[str] = self._get_keys(meeting_pk)
+        await within_deadline(self._commit(keys=[keys[1], keys[3]], args=[ticket_pk, self._state_ttl]))
+
+    async def cancel(self, meeting_pk: int, tg_id: int):
+        keys: list[str] = self._get_keys(meeting_pk)
+        await within_deadline(self._cancel(keys=[keys[2], keys[3], keys[4]], args=[tg_id]))
+
+    async def invalidate(self, meeting_pk: int):
+        # rebuilt from the backend on the next allocation, a held seat stays out until its hold expires
+        await within_deadline(self._redis.db_redis.delete(self._get_keys(meeting_pk)[2]))
+
+    def get_stats(self) -> dict[str, int]:
+        return dict(self._stats)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        clear_deadline()
+        while True:
+            try:
+                read_at: int = await self._get_time()
+                for meeting in await self._load_meetings():
+                    await self._run_reconcile(meeting, read_at, only_if_missing=False)
+                    self._stats["reconciled"] += 1
+            except Exception:
+                self._stats["errors"] += 1
+            await asyncio.sleep(self._reconcile_interval)
+
+    async def _seed(self, meeting_pk: int):
+        read_at: int = await self._get_time()
+        meeting: Meeting | None = await self._load_meeting(meeting_pk)
+        if meeting:
+            await self._run_reconcile(meeting, read_at, only_if_missing=True)
+
+    async def _run_reconcile(self, meeting: Meeting, read_at: int, only_if_missing: bool):
+        args: list = [self._hold_ttl, self._state_ttl, int(only_if_missing), read_at]
+        args += [ticket.get_pk() for ticket in meeting.get_free_tickets()]
+        await within_deadline(self._reconcile(keys=self._get_keys(meeting.get_pk()), args=args))
+
+    async def _get_time(self) -> int:
+        # redis time, the same clock the scripts stamp the seats with
+        seconds, _ = await within_deadline(self._redis.db_redis.time())
+        return int(seconds)
+
+    def _get_keys(self, meeting_pk: int) -> list[str]:
+        return [
+            self._redis.generate_key([SEATS, "free", meeting_pk]),
+            self._redis.generate_key([SEATS, "held", meeting_pk]),
+            self._redis.generate_key([SEATS, "seeded", meeting_pk]),
+            self._redis.generate_key([SEATS, "taken", meeting_pk]),
+            self._redis.generate_key([SEATS, "member", meeting_pk]),
+        ]
@@ -0,0 +1,275 @@
+import asyncio
+import heapq
+import time
+from collections import deque
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import DeleteMessage, SendMessage, TelegramMethod
+from aiogram.types import InlineKeyboardMarkup
+
+from utils.Deadline import clear_deadline
+
+
+# lanes, the lower goes first
+USER = 0
+ADMIN = 1
+BULK = 2
+
+IDLE_BUCKETS_LIMIT = 10000
+
+
+class TokenBucket:
+    __slots__ = ("_rate", "_capacity", "_tokens", "_updated_at")
+
+    def __init__(self, rate: float, capacity: float):
+        self._rate: float = rate
+        self._capacity: float = capacity
+        self._tokens: float = capacity
+        self._updated_at: float = time.monotonic()
+
+    def get_delay(self, now: float) -> float:
+        self._fill(now)
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self._rate
+
+    def take(self, now: float):
+        self._fill(now)
+        self._tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._fill(now)
+        return self._tokens >= self._capacity
+
+    def _fill(self, now: float):
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+
+class SendQueueStopped(Exception):
+    pass
+
+
+class QueuedMethod:
+    __slots__ = ("chat_id", "method", "future", "seq", "attempts")
+
+    def __init__(self, chat_id: int | str, method: TelegramMethod, future: asyncio.Future, seq: int):
+        self.chat_id: int | str = chat_id
+        self.method: TelegramMethod = method
+        self.future: asyncio.Future = future
+        self.seq: int = seq
+        self.attempts: int = 0
+
+
+class Lane:
+    __slots__ = ("chats", "ready")
+
+    def __init__(self):
+        # messages of a chat keep their order, only the first one of each chat is in the heap
+        self.chats: dict[str, deque[QueuedMethod]] = {}
+        # (when the chat may be sent to, seq, chat id), one entry per chat with messages
+        self.ready: list[tuple[float, int, str]] = []
+
+
+class SendQueue:
+    # the buckets live in this process: with several replicas global_rate has to be split between them
+    def __init__(
+            self, bot: Bot, global_rate: float = 30.0, chat_rate: float = 1.0,
+            group_rate: float = 20 / 60, max_attempts: int = 3,
+    ):
+        self._bot: Bot = bot
+        self._chat_rate: float = chat_rate
+        self._group_rate: float = group_rate
+        self._max_attempts: int = max_attempts
+        self._global: TokenBucket = TokenBucket(rate=global_rate, capacity=global_rate)
+        self._buckets: dict[str, TokenBucket] = {}
+        # chats telegram asked to wait with retry_after
+        self._blocked_until: dict[str, float] = {}
+        self._lanes: list[Lane] = [Lane() for _ in (USER, ADMIN, BULK)]
+        self._pending: int = 0
+        self._seq: int = 0
+        self._wakeup: asyncio.Event = asyncio.Event()
+        self._sending: dict[asyncio.Task, QueuedMethod] = {}
+        self._task: asyncio.Task | None = None
+        self._stats: dict[str, int] = {
+            "queued": 0,
+            "sent": 0,
+            "retry_after": 0,
+            "failed": 0,
+            "dropped": 0,
+        }
+
+    def send(self, method: TelegramMethod, lane: int = USER) -> asyncio.Future:
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # nobody has to wait for the result, a failure must not be reported as never retrieved
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if self._task is None:
+            self._stats["dropped"] += 1
+            future.set_exception(SendQueueStopped())
+            return future
+
+        self._seq += 1
+        self._push(lane, QueuedMethod(chat_id=method.chat_id, method=method, future=future, seq=self._seq))
+        self._stats["queued"] += 1
+        return future
+
+    def send_message(
+            self, chat_id: int | str, text: str, reply_markup: InlineKeyboardMarkup | None = None,
+            lane: int = USER,
+    ) -> asyncio.Future:
+        return self.send(SendMessage(chat_id=chat_id, text=text, reply_markup=reply_markup), lane=lane)
+
+    def delete_message(self, chat_id: int | str, message_id: int, lane: int = USER) -> asyncio.Future:
+        return self.send(DeleteMessage(chat_id=chat_id, message_id=message_id), lane=lane)
+
+    def get_stats(self) -> dict[str, int]:
+        return {**self._stats, "pending": self._pending, "sending": len(self._sending)}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        if self._task is None:
+            return
+
+        # what is queued still goes out while the timeout allows
+        stop_at: float = time.monotonic() + timeout
+        while (self._pending or self._sending) and time.monotonic() < stop_at:
+            await asyncio.sleep(0.05)
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        items: list[QueuedMethod] = list(self._sending.values())
+        for task in self._sending:
+            task.cancel()
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+
+        # the rest is failed, so nobody waits for a result forever
+        for lane in self._lanes:
+            for queue in lane.chats.values():
+                items += queue
+            lane.chats.clear()
+            lane.ready.clear()
+        self._sending.clear()
+        self._pending = 0
+        for item in items:
+            if not item.future.done():
+                self._stats["dropped"] += 1
+                item.future.set_exception(SendQueueStopped())
+
+    def _push(self, lane: int, item: QueuedMethod, first: bool = False):
+        chat_id: str = str(item.chat_id)
+        chats: dict[str, deque[QueuedMethod]] = self._lanes[lane].chats
+        queue: deque[QueuedMethod] | None = chats.get(chat_id)
+        if queue is None:
+            queue = chats[chat_id] = deque()
+            heapq.heappush(self._lanes[lane].ready, (0.0, item.seq, chat_id))
+        if first:
+            queue.appendleft(item)
+        else:
+            queue.append(item)
+        self._pending += 1
+        self._wakeup.set()
+
+    async def _run(self):
+        clear_deadline()
+        while True:
+            lane, item, delay = self._get_next()
+            if item is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now: float = time.monotonic()
+            self._global.take(now)
+            self._get_bucket(item.chat_id).take(now)
+            task: asyncio.Task = asyncio.create_task(self._send(lane, item))
+            self._sending[task] = item
+            task.add_done_callback(self._sent)
+
+    def _get_next(self) -> tuple[int, QueuedMethod | None, float | None]:
+        now: float = time.monotonic()
+        delay: float = self._global.get_delay(now)
+        if delay > 0:
+            return USER, None, delay
+
+        # the first chat of the best lane that may be sent to, a waiting chat is only moved down its own heap
+        delay: float | None = None
+        for lane_id, lane in enumerate(self._lanes):
+            while lane.ready:
+                ready_at, seq, chat_id = lane.ready[0]
+                if ready_at > now:
+                    delay = ready_at - now if delay is None else min(delay, ready_at - now)
+                    break
+
+                chat_delay: float = max(
+                    self._get_bucket(chat_id).get_delay(now),
+                    self._blocked_until.get(chat_id, now) - now,
+                )
+                if chat_delay > 0:
+                    heapq.heapreplace(lane.ready, (now + chat_delay, seq, chat_id))
+                    continue
+
+                heapq.heappop(lane.ready)
+                queue: deque[QueuedMethod] = lane.chats[chat_id]
+                item: QueuedMethod = queue.popleft()
+                if queue:
+                    heapq.heappush(lane.ready, (now, queue[0].seq, chat_id))
+                else:
+                    del lane.chats[chat_id]
+                self._pending -= 1
+                return lane_id, item, None
+
+        return USER, None, delay
+
+    async def _send(self, lane: int, item: QueuedMethod):
+        try:
+            result: Any = await self._bot(item.method)
+        except TelegramRetryAfter as e:
+            self._stats["retry_after"] += 1
+            item.attempts += 1
+            if item.attempts >= self._max_attempts:
+                self._stats["failed"] += 1
+                item.future.set_exception(e)
+                return
+            self._blocked_until[str(item.chat_id)] = time.monotonic() + e.retry_after
+            # back to the head of its chat, so the chat keeps its order
+            self._push(lane, item, first=True)
+        except Exception as e:
+            self._stats["failed"] += 1
+            item.future.set_exception(e)
+        else:
+            self._stats["sent"] += 1
+            item.future.set_result(result)
+
+    def _sent(self, task: asyncio.Task):
+        self._sending.pop(task, None)
+
+    def _get_bucket(self, chat_id: int | str) -> TokenBucket:
+        chat_id = str(chat_id)
+        bucket: TokenBucket | None = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) >= IDLE_BUCKETS_LIMIT:
+                self._drop_idle()
+            # groups and channels have negative ids
+            rate: float = self._group_rate if chat_id.startswith("-") else self._chat_rate
+            bucket = TokenBucket(rate=rate, capacity=1)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _drop_idle(self):
+        now: float = time.monotonic()
+        for chat_id in [chat_id for chat_id, bucket in self._buckets.items() if bucket.is_full(now)]:
+            del self._buckets[chat_id]
+        for chat_id in [chat_id for chat_id, until in self._blocked_until.items() if until <= now]:
+            del self._blocked_until[chat_id]
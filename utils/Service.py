@@ -26,7 +26,7 @@ CURRENCY = "₽"
 
 class Service:
     @staticmethod
-    async def add_member(tg_user: User):
+    async def add_member(tg_user: User) -> Member:
         try:
             login = tg_user.mention
         except AttributeError:
@@ -40,11 +40,11 @@ class Service:
             name=tg_user.first_name,
             surname=tg_user.last_name,
         )
-        await api_members.add_member(new_member=new_member)
+        return await api_members.add_member(new_member=new_member)
 
     @staticmethod
     def get_meeting_text(member: Member, meeting: Meeting, show_cnt_tickets: bool = True, *ext_text) -> str:
-        free_tickets: list[Ticket] = meeting.get_free_tickets()
+        cnt_free_tickets: int = meeting.get_cnt_free_tickets()
         member_ticket: Ticket | None = meeting.get_ticket_by_tg_id(tg_id=member.get_tg_id())
         if member_ticket:
             booking = member_ticket.get_booking()
@@ -55,15 +55,15 @@ class Service:
             else:
                 tickets_info: str = "\nМы создали бронирование!\nОплатите его по номер +7 (800) 555-35-35 (Соня Батьковна А.) на Сбербанк / Тинькофф и подтвердите перевод по кнопке 'Подтвердить'"
 
-        elif free_tickets:
-            tickets_info: str = msg_text.cnt_free_tickets(len(free_tickets))
+        elif cnt_free_tickets:
+            tickets_info: str = msg_text.cnt_free_tickets(cnt_free_tickets)
         else:
             tickets_info: str = msg_text.no_free_tickets()
 
         meeting_date: str = meeting.get_date_time().strftime(datetime_format_str)
         place: Place = meeting.get_place()
         place_text: str = f"[{place.get_name()}]({place.get_link()})"
-        price = int(free_tickets[0].get_price())
+        price = int(meeting.get_tickets()[0].get_price())
         price_str = str(price) + CURRENCY
 
         text_parts = [
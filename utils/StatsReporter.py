@@ -0,0 +1,52 @@
+import asyncio
+import json
+import logging
+from typing import Any, Callable
+
+from utils.Deadline import clear_deadline
+
+
+logger = logging.getLogger("stats")
+
+
+class StatsReporter:
+    def __init__(self, sources: dict[str, Callable[[], dict[str, Any]]], interval: float):
+        self._sources: dict[str, Callable[[], dict[str, Any]]] = sources
+        self._interval: float = interval
+        self._task: asyncio.Task | None = None
+
+    def collect(self) -> dict[str, Any]:
+        stats: dict[str, Any] = {}
+        for name, get_stats in self._sources.items():
+            try:
+                stats[name] = get_stats()
+            except Exception as e:
+                stats[name] = {"error": repr(e)}
+        return stats
+
+    def start(self):
+        # 0 turns the reports off
+        if self._task is None and self._interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # the last numbers before the process goes away
+        self._report()
+
+    async def _run(self):
+        clear_deadline()
+        while True:
+            await asyncio.sleep(self._interval)
+            self._report()
+
+    def _report(self):
+        logger.info("%s", json.dumps(self.collect(), default=str, separators=(",", ":")))